@@ -1,6 +1,7 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 import os
 from sqlalchemy import text
 
@@ -9,10 +10,31 @@ from .routes import secure as secure_routes
 from .routes import payment as payment_routes
 from .routes import ai as ai_routes
 from .routes import dashboard
+from .routes import metrics as metrics_routes
+from .routes import images as image_routes
+from .routes.uploads import UploadFiles
 from .database import Base, engine
 from . import models  # noqa: F401 ensures models are imported for table creation
+from .services.process_pool import PoolBusyError, image_pool
+from .services.storage import UPLOAD_DIR
+from .services import job_queue, model_sessions
+from .services.ai_service import ai_service
 
-app = FastAPI(title="ClickScape API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if job_queue.JOB_QUEUE_MODE == "embedded":
+        job_queue.job_workers.start()
+    if model_sessions.REMBG_PRELOAD and not ai_service.has_bg_provider:
+        # Loads and warms up on a background thread; GET /ai/ready turns 200 when done
+        model_sessions.rembg_sessions.start()
+    yield
+    await job_queue.job_workers.stop()
+    # Stop worker processes so reloads/shutdowns don't leave orphans behind
+    image_pool.shutdown()
+
+
+app = FastAPI(title="ClickScape API", version="0.1.0", lifespan=lifespan)
 
 # CORS settings
 # IMPORTANT: When using cookies (allow_credentials=True), you must NOT use "*".
@@ -38,10 +60,9 @@ app.add_middleware(
 )
 
 
-# Static uploads directory (development)
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
+# Static uploads directory (development); resolves both flat and sharded URLs
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+app.mount("/uploads", UploadFiles(directory=UPLOAD_DIR), name="uploads")
 
 
 @app.get("/")
@@ -61,6 +82,14 @@ app.include_router(dashboard.router, tags=["dashboard"])  # contains /dashboard/
 app.include_router(secure_routes.router, tags=["secure"])  # /secure/download
 app.include_router(ai_routes.router, prefix="/ai", tags=["ai"])  # premium-only features
 app.include_router(payment_routes.router, prefix="/payment", tags=["payment"])  # payments
+app.include_router(metrics_routes.router, tags=["metrics"])  # /metrics
+app.include_router(image_routes.router, tags=["images"])  # /img/{photo_id} on-demand transforms
+
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request: Request, exc: PoolBusyError):
+    # Worker pool saturated: shed load instead of queuing without bound
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
 
 # Create tables in development (use Alembic for migrations in production)
 Base.metadata.create_all(bind=engine)
@@ -78,6 +107,16 @@ def _ensure_sqlite_column(table: str, column: str, ddl: str):
         # best-effort; ignore in dev
         pass
 
+def _ensure_sqlite_index(table: str, column: str):
+    # create_all skips indexes of columns added by _ensure_sqlite_column
+    try:
+        if not str(engine.url).startswith("sqlite"):
+            return
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+    except Exception:
+        pass
+
 # Add 'phone' to profiles if missing
 _ensure_sqlite_column("profiles", "phone", "phone VARCHAR(255) DEFAULT ''")
 
@@ -105,6 +144,20 @@ _ensure_sqlite_column("photos", "royalty_percent", "royalty_percent FLOAT DEFAUL
 _ensure_sqlite_column("photos", "for_sale", "for_sale BOOLEAN DEFAULT 0")
 _ensure_sqlite_column("photos", "is_public", "is_public BOOLEAN DEFAULT 1")
 _ensure_sqlite_column("photos", "competition_entry", "competition_entry BOOLEAN DEFAULT 0")
+_ensure_sqlite_column("photos", "derivatives", "derivatives TEXT DEFAULT ''")
+_ensure_sqlite_column("photos", "content_hash", "content_hash VARCHAR(64)")
+_ensure_sqlite_column("photos", "status", "status VARCHAR(16) DEFAULT 'ready'")
+_ensure_sqlite_column("photos", "phash", "phash VARCHAR(16)")
+_ensure_sqlite_column("photos", "duplicate_of", "duplicate_of INTEGER")
+_ensure_sqlite_column("photos", "width", "width INTEGER")
+_ensure_sqlite_column("photos", "height", "height INTEGER")
+_ensure_sqlite_column("photos", "megapixels", "megapixels FLOAT")
+_ensure_sqlite_column("photos", "orientation", "orientation VARCHAR(10)")
+_ensure_sqlite_column("photos", "image_format", "image_format VARCHAR(8)")
+_ensure_sqlite_column("photos", "exif", "exif TEXT DEFAULT ''")
+_ensure_sqlite_index("photos", "phash")
+_ensure_sqlite_index("photos", "megapixels")
+_ensure_sqlite_index("photos", "orientation")
 
 # New dev columns for roles and payments
 _ensure_sqlite_column("users", "role", "role VARCHAR(32) DEFAULT 'free'")
@@ -0,0 +1,150 @@
+"""Move flat uploads into the sharded layout and rewrite the URLs stored in the DB.
+
+    python -m app.migrate_uploads                # files, then DB rows
+    python -m app.migrate_uploads --files-only   # or --db-only
+    python -m app.migrate_uploads --dry-run      # report what would change
+
+Run it from backend/ against the live app: every step is an atomic rename or
+a small committed batch, and old and new URLs both resolve throughout (see
+services/storage.url_to_path). It can be interrupted and re-run at any time;
+DB progress is checkpointed in uploads/.shard-migration.json (--reset to
+start over).
+"""
+import argparse
+import json
+import os
+
+from sqlalchemy import update
+
+from . import models  # noqa: F401 registers all tables on the metadata
+from .database import SessionLocal
+from .models.blob import Blob
+from .models.photo import Photo
+from .models.profile import Profile
+from .services.storage import UPLOAD_DIR, canonical_url, path_for, relpath_for
+
+STATE_PATH = os.path.join(UPLOAD_DIR, ".shard-migration.json")
+
+# model -> (plain URL columns, JSON columns holding URLs)
+URL_COLUMNS = (
+    (Photo, ("url", "processed_url", "original_url"), ("derivatives",)),
+    (Blob, ("url",), ("derivatives",)),
+    (Profile, ("avatar_url",), ()),
+)
+
+
+def _load_state() -> dict:
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state: dict) -> None:
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_PATH)
+
+
+def migrate_files(dry_run: bool = False, log_every: int = 1000) -> dict:
+    """Move every top-level file in UPLOAD_DIR to its shard directory."""
+    counts = {"moved": 0, "duplicates": 0, "conflicts": 0}
+    with os.scandir(UPLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                continue
+            if dry_run:
+                counts["moved"] += 1
+                continue
+            dest = path_for(entry.name)
+            if os.path.exists(dest):
+                if os.path.getsize(dest) == entry.stat().st_size:
+                    # Already copied by an earlier interrupted run or written since
+                    os.remove(entry.path)
+                    counts["duplicates"] += 1
+                else:
+                    print(f"[migrate] conflict, left in place: {entry.name} vs {relpath_for(entry.name)}")
+                    counts["conflicts"] += 1
+                continue
+            os.replace(entry.path, dest)
+            counts["moved"] += 1
+            if counts["moved"] % log_every == 0:
+                print(f"[migrate] moved {counts['moved']} files")
+    return counts
+
+
+def _rewrite_json(value: str | None) -> str | None:
+    if not value:
+        return value
+    try:
+        data = json.loads(value)
+    except ValueError:
+        return value
+
+    def walk(node):
+        if isinstance(node, dict):
+            return {k: walk(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [walk(v) for v in node]
+        if isinstance(node, str):
+            return canonical_url(node)
+        return node
+
+    rewritten = json.dumps(walk(data))
+    return value if json.loads(rewritten) == data else rewritten
+
+
+def migrate_rows(batch: int = 500, dry_run: bool = False, state: dict | None = None) -> dict:
+    """Rewrite stored upload URLs to the sharded form, batch by batch."""
+    state = state if state is not None else {}
+    counts = {}
+    for model, url_cols, json_cols in URL_COLUMNS:
+        table = model.__tablename__
+        cursor = int(state.get(table, 0))
+        changed = 0
+        cols = [getattr(model, c) for c in url_cols + json_cols]
+        while True:
+            with SessionLocal() as db:
+                rows = db.query(model.id, *cols).filter(model.id > cursor).order_by(model.id).limit(batch).all()
+                if not rows:
+                    break
+                for row in rows:
+                    values = dict(zip(url_cols + json_cols, row[1:]))
+                    for name, old in values.items():
+                        new = _rewrite_json(old) if name in json_cols else (canonical_url(old) if old else old)
+                        if new == old:
+                            continue
+                        changed += 1
+                        if not dry_run:
+                            # Conditional so a concurrent edit of the same column wins
+                            col = getattr(model, name)
+                            db.execute(update(model).where(model.id == row[0], col == old).values({name: new}))
+                cursor = rows[-1][0]
+                if not dry_run:
+                    db.commit()
+                    state[table] = cursor
+                    _save_state(state)
+        counts[table] = changed
+        print(f"[migrate] {table}: {changed} URL(s) {'to rewrite' if dry_run else 'rewritten'}")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shard the uploads directory")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--files-only", action="store_true")
+    parser.add_argument("--db-only", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="ignore the DB checkpoint")
+    args = parser.parse_args()
+    state = {} if args.reset else _load_state()
+    if not args.db_only:
+        print(f"[migrate] files: {migrate_files(dry_run=args.dry_run)}")
+    if not args.files_only:
+        migrate_rows(batch=args.batch, dry_run=args.dry_run, state=state)
+
+
+if __name__ == "__main__":
+    main()
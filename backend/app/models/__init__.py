@@ -6,3 +6,5 @@ from .participation import Participation  # noqa
 from .profile import Profile  # noqa
 from .questionnaire import Questionnaire  # noqa
 from .purchase import Purchase  # noqa
+from .blob import Blob  # noqa
+from .job import Job  # noqa
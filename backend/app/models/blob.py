@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text, UniqueConstraint
+from ..database import Base
+import time
+
+
+class Blob(Base):
+    """Content-addressed stored file set, shared by every photo with the same source bytes."""
+    __tablename__ = "blobs"
+    __table_args__ = (UniqueConstraint("digest", "profile", name="uq_blobs_digest_profile"),)
+    id = Column(Integer, primary_key=True, index=True)
+    # digest: SHA-256 (hex) of the uploaded source file
+    digest = Column(String(64), index=True, nullable=False)
+    # profile: what was stored for that source: 'original' | 'free' (watermarked renders) | 'premium'
+    profile = Column(String(16), nullable=False)
+    # url: original file, or the full-size fallback render (processed_url)
+    url = Column(String, nullable=True)
+    # derivatives: JSON map of renditions (render profiles only), same shape as Photo.derivatives
+    derivatives = Column(Text, default="")
+    size = Column(Integer, default=0)  # bytes on disk for this blob's files
+    refcount = Column(Integer, default=0)
+    created_at = Column(Integer, default=lambda: int(time.time()))
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, Index
+from ..database import Base
+import time
+
+
+class Job(Base):
+    """Durable background job (see services/job_queue.py)."""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(64), nullable=False)
+    ref = Column(String(64), index=True)  # what the job is about, e.g. "photo:12"
+    payload = Column(Text, default="{}")  # JSON
+    # status: 'queued' | 'running' | 'done' | 'dead' (dead-lettered after max_attempts)
+    status = Column(String(16), default="queued", nullable=False)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(Integer, default=0)  # epoch seconds; retries are delayed with backoff
+    locked_by = Column(String(128), nullable=True)
+    locked_at = Column(Integer, nullable=True)
+    last_error = Column(Text, default="")
+    created_at = Column(Integer, default=lambda: int(time.time()))
+    updated_at = Column(Integer, default=lambda: int(time.time()))
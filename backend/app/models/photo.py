@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text
 from ..database import Base
 
 class Photo(Base):
@@ -15,6 +15,8 @@ class Photo(Base):
     # Marketplace flags
     for_sale = Column(Boolean, default=False)
     is_public = Column(Boolean, default=True)
+    # Submitted to the competition via /competitions/submit
+    competition_entry = Column(Boolean, default=False)
     # processed_url: the watermarked/derived image (free users see this)
     url = Column(String, nullable=True)  # legacy field kept for compatibility
     processed_url = Column(String, nullable=True)
@@ -22,3 +24,24 @@ class Photo(Base):
     original_url = Column(String, nullable=True)
     # bytes_size: original file size in bytes (for quota)
     bytes_size = Column(Integer, default=0)
+    # derivatives: JSON map of responsive renditions
+    # {"thumb": {"width": 320, "height": 213, "jpeg": "/uploads/..", "webp": "/uploads/.."}, ...}
+    derivatives = Column(Text, default="")
+    # content_hash: SHA-256 of the uploaded source; links the photo to its Blob rows
+    content_hash = Column(String(64), index=True, nullable=True)
+    # status: 'processing' while derivatives are being generated, then 'ready' (or 'failed')
+    status = Column(String(16), default="ready")
+    # phash: 64-bit perceptual (difference) hash as hex, for near-duplicate lookups
+    phash = Column(String(16), index=True, nullable=True)
+    # duplicate_of: earliest near-identical photo found when this one was hashed
+    duplicate_of = Column(Integer, nullable=True)
+    # Image metadata, read from the upload's header when it is rendered (or by the backfill job)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    megapixels = Column(Float, index=True, nullable=True)
+    # 'landscape' | 'portrait' | 'square' (from width/height as stored, EXIF rotation not applied)
+    orientation = Column(String(10), index=True, nullable=True)
+    image_format = Column(String(8), nullable=True)  # jpeg, png, tiff, psd
+    # JSON of selected EXIF fields: make, model, lens, taken_at, iso, exposure_time, f_number,
+    # focal_length and the raw EXIF orientation tag (1-8)
+    exif = Column(Text, default="")
@@ -1,26 +1,40 @@
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from ..database import get_db
 from .auth import get_current_user
 from ..models.user import User
-from ..services.plan_service import get_plan, normalize_ext
-from ..services.ai_service import AIService
-import os
-import uuid
+from ..services.plan_service import get_plan, get_upload_rules, normalize_ext
+from ..services.ai_service import ai_service
+from ..services.model_sessions import rembg_sessions
+from ..services.process_pool import PoolBusyError, image_pool
+from ..services.upload_ingest import ingest_upload, UploadTooLarge
+from ..services.blob_store import put_bytes
 
 router = APIRouter()
 
 
+@router.get("/ready")
+def ai_ready():
+    # Readiness probe: 503 until the local background-removal model is loaded and warmed up
+    stats = rembg_sessions.stats()
+    ready = ai_service.has_bg_provider or rembg_sessions.ready
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"ready": ready, "provider": ai_service.has_bg_provider, "rembg": stats})
+
+
 def _save_bytes(data: bytes, ext: str) -> str:
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # .../app
-    upload_dir = os.path.join(base_dir, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-    ext = (ext or ".png").lower()
-    filename = f"ai_{uuid.uuid4().hex}{ext}"
-    file_path = os.path.join(upload_dir, filename)
-    with open(file_path, "wb") as f:
-        f.write(data)
-    return f"/uploads/{filename}"
+    # Content-addressed: re-running a tool that yields identical output reuses the file
+    return put_bytes(data, ext or ".png", prefix="ai_")
+
+
+async def _ingest(image: UploadFile):
+    # AI tools are premium features: apply the premium size limit while streaming
+    _exts, max_bytes, _limit = get_upload_rules("premium")
+    try:
+        return await ingest_upload(image, max_bytes, normalize_ext(image.filename))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
 
 def _allowed(user: User) -> bool:
@@ -38,9 +52,23 @@ async def background_remove(
     # Premium or creator
     if not _allowed(user):
         raise HTTPException(status_code=403, detail="Upgrade to Premium or Creator+ to use background removal")
-    ai = AIService()
-    raw = await image.read()
-    out = ai.background_remove(raw, image.filename or "image.png")
+    upload = await _ingest(image)
+    filename = image.filename or "image.png"
+    try:
+        if ai_service.has_bg_provider:
+            out = await image_pool.run(ai_service.background_remove, upload.path, filename)
+        else:
+            # Local model: borrow a preloaded session; inference runs on a thread (ORT releases the GIL)
+            try:
+                out = await rembg_sessions.run(
+                    lambda session: ai_service.background_remove(upload.path, filename, session=session))
+            except PoolBusyError:
+                raise  # 503 with Retry-After
+            except RuntimeError as e:
+                print(f"[ai] background_remove: {e}")
+                out = None
+    finally:
+        upload.discard()
     if not out:
         raise HTTPException(status_code=502, detail="Background removal service unavailable")
     url = _save_bytes(out, normalize_ext(image.filename) or ".png")
@@ -56,9 +84,11 @@ async def ai_enhance(
     # Premium or creator
     if not _allowed(user):
         raise HTTPException(status_code=403, detail="Upgrade to Premium or Creator+ to use AI Enhance")
-    ai = AIService()
-    raw = await image.read()
-    out = ai.ai_enhance(raw, image.filename or "image.jpg", mode="autofix")
+    upload = await _ingest(image)
+    try:
+        out = await image_pool.run(ai_service.ai_enhance, upload.path, image.filename or "image.jpg", "autofix")
+    finally:
+        upload.discard()
     if not out:
         raise HTTPException(status_code=502, detail="AI enhance service unavailable")
     url = _save_bytes(out, normalize_ext(image.filename) or ".jpg")
@@ -74,9 +104,11 @@ async def ai_upscale(
     # Premium or creator
     if not _allowed(user):
         raise HTTPException(status_code=403, detail="Upgrade to Premium or Creator+ to use Upscale")
-    ai = AIService()
-    raw = await image.read()
-    out = ai.upscale(raw, image.filename or "image.jpg", scale=2)
+    upload = await _ingest(image)
+    try:
+        out = await image_pool.run(ai_service.upscale, upload.path, image.filename or "image.jpg", 2)
+    finally:
+        upload.discard()
     if not out:
         raise HTTPException(status_code=502, detail="Upscale service unavailable")
     url = _save_bytes(out, normalize_ext(image.filename) or ".jpg")
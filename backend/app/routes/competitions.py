@@ -5,6 +5,8 @@ from ..models.participation import Participation
 from ..schemas.participation import ParticipationCreate, ParticipationOut
 from .auth import get_current_user
 from ..models.photo import Photo
+from ..services.photo_service import PhotoService
+from ..services.phash_index import DuplicatePhotoError
 from sqlalchemy import select
 
 router = APIRouter()
@@ -38,12 +40,13 @@ def join_competition(payload: ParticipationCreate, db: Session = Depends(get_db)
 
 
 @router.post("/submit")
-def submit_entry(photo_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def submit_entry(photo_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
     """Mark a user's photo as a competition entry.
 
     Requirements:
     - User must have joined (entry_paid)
     - User must own the photo
+    - Photo must not be a near-duplicate of an existing entry (any category)
     - Sets a competition_entry flag on the photo
     """
     # Ensure user joined
@@ -58,6 +61,14 @@ def submit_entry(photo_id: int, db: Session = Depends(get_db), user=Depends(get_
     if p.user_id != user.id:
         raise HTTPException(status_code=403, detail="You do not own this photo")
 
+    # Same frame entered twice (e.g. under another category)?
+    service = PhotoService(db)
+    await service.ensure_phash(p)
+    try:
+        service.check_competition_entry(p)
+    except DuplicatePhotoError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     # Flag as competition entry
     if not hasattr(p, 'competition_entry'):
         # Safety: if column doesn't exist, error out
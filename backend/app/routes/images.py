@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from typing import Optional
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..models.photo import Photo
+from ..services import image_transform
+from ..services.image_processing import FORMAT_MEDIA_TYPES
+
+router = APIRouter()
+
+
+@router.get("/img/{photo_id}")
+async def transform_image(
+    photo_id: int,
+    request: Request,
+    w: int = Query(0, ge=0),
+    h: int = Query(0, ge=0),
+    fit: str = Query("contain"),
+    fmt: str = Query("auto"),
+    q: int = Query(0, ge=0),
+    sig: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Resize/crop a photo on demand, e.g. /img/12?w=640&h=480&fit=cover&fmt=webp."""
+    try:
+        params = image_transform.parse(photo_id, w, h, fit, fmt, q, sig)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    try:
+        found = await image_transform.transform(photo, params, request.headers.get("accept", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="Image not available")
+    path, out_fmt = found
+    headers = {"Cache-Control": "public, max-age=86400"}
+    if params.fmt == "auto":
+        headers["Vary"] = "Accept"
+    return FileResponse(path, media_type=FORMAT_MEDIA_TYPES[out_fmt], headers=headers)
@@ -5,6 +5,7 @@ from .auth import get_current_user
 from ..models.user import User
 from ..services.plan_service import get_plan
 from ..services.photo_service import PhotoService
+from ..services.phash_index import DuplicatePhotoError
 from ..schemas.photos import PhotoOut
 import os
 
@@ -63,6 +64,8 @@ def publish(photo_id: int, db: Session = Depends(get_db), user: User = Depends(g
         return svc.publish(photo_id, user)
     except PermissionError:
         raise HTTPException(status_code=403, detail="Not allowed")
+    except DuplicatePhotoError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError:
         raise HTTPException(status_code=404, detail="Not found")
 
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from ..services import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics():
+    # Point-in-time counters for worker pools and queues
+    return metrics.snapshot()
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException, Request
+from fastapi.responses import FileResponse
+from typing import List, Literal, Optional
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..schemas.photos import PhotoOut, PhotoFilter, PhotoUpdate
+from ..schemas.photos import PhotoOut, PhotoFilter, PhotoUpdate, BatchUploadOut, PhotoStatusOut
 from ..services.photo_service import PhotoService
+from ..services.image_processing import FORMAT_MEDIA_TYPES
+from ..services.storage import url_to_path
 from .auth import get_current_user
 from ..models.user import User
 from ..services.plan_service import get_plan, get_upload_rules
@@ -58,10 +61,15 @@ def list_photos(
     category: Optional[str] = None,
     location: Optional[str] = None,
     popularity: Optional[str] = None,
+    orientation: Optional[Literal["landscape", "portrait", "square"]] = None,
+    min_megapixels: Optional[float] = Query(None, ge=0),
+    max_megapixels: Optional[float] = Query(None, ge=0),
+    image_format: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
     service = PhotoService(db)
-    filters = PhotoFilter(category=category, location=location, popularity=popularity)
+    filters = PhotoFilter(category=category, location=location, popularity=popularity, orientation=orientation,
+                          min_megapixels=min_megapixels, max_megapixels=max_megapixels, image_format=image_format)
     return service.list_photos(page=page, size=size, filters=filters)
 
 
@@ -85,6 +93,50 @@ def get_photo(photo_id: int, db: Session = Depends(get_db)):
     return PhotoOut.from_orm(photo)
 
 
+@router.get("/{photo_id}/status", response_model=PhotoStatusOut)
+def get_photo_status(photo_id: int, db: Session = Depends(get_db)):
+    """Poll after an upload: processing -> ready (or failed once retries are exhausted)."""
+    service = PhotoService(db)
+    photo = service.get_photo(photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    return service.get_status(photo)
+
+
+@router.get("/{photo_id}/similar", response_model=List[PhotoOut])
+async def similar_photos(photo_id: int, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    """Near-duplicates of a photo by perceptual hash, closest first."""
+    service = PhotoService(db)
+    photo = service.get_photo(photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    await service.ensure_phash(photo)
+    matches = [p for p, _d in service.near_duplicates(photo) if p.is_public and p.status in (None, "ready")]
+    return [PhotoOut.from_orm(p) for p in matches[:limit]]
+
+
+@router.get("/{photo_id}/image")
+def get_photo_image(photo_id: int, request: Request, size: str = Query("card", pattern="^(thumb|card|large|full)$"), db: Session = Depends(get_db)):
+    """Serve a responsive rendition, picking AVIF/WebP/JPEG from the Accept header."""
+    service = PhotoService(db)
+    photo = service.get_photo(photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    found = service.derivative_file(photo, size, request.headers.get("accept", ""))
+    if not found:
+        # Legacy photos only have processed_url
+        legacy = url_to_path(photo.processed_url or photo.url or "")
+        if not legacy or not os.path.isfile(legacy):
+            raise HTTPException(status_code=404, detail="Image not available")
+        return FileResponse(legacy, headers={"Cache-Control": "public, max-age=86400"})
+    path, fmt = found
+    return FileResponse(
+        path,
+        media_type=FORMAT_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "public, max-age=86400", "Vary": "Accept"},
+    )
+
+
 @router.put("/{photo_id}", response_model=PhotoOut)
 def update_photo(photo_id: int, payload: PhotoUpdate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     service = PhotoService(db)
@@ -111,7 +163,7 @@ def delete_photo(photo_id: int, db: Session = Depends(get_db), user: User = Depe
         raise HTTPException(status_code=404, detail="Photo not found")
 
 
-@router.post("/upload/batch", response_model=List[PhotoOut])
+@router.post("/upload/batch", response_model=BatchUploadOut)
 async def upload_batch(
     title: str = Form(""),
     category: str = Form("uncategorized"),
@@ -142,23 +194,18 @@ async def upload_batch(
         if len(images) > upload_limit:
             raise HTTPException(status_code=400, detail=f"{plan.capitalize()} plan allows up to {upload_limit} images per batch. Upgrade or join competition for more.")
     service = PhotoService(db)
-    results: List[PhotoOut] = []
-    for img in images:
-        try:
-            out = await service.upload_photo(
-                title=title or (img.filename or "Untitled"),
-                category=category,
-                tags=tags or "",
-                price=price or 0.0,
-                watermark=True,
-                image=img,
-                user=user,
-            )
-            results.append(out)
-        except ValueError as e:
-            # Skip invalid with error note using dummy placeholder
-            raise HTTPException(status_code=400, detail=str(e))
-    return results
+    try:
+        return await service.upload_batch(
+            title=title,
+            category=category,
+            tags=tags or "",
+            price=price or 0.0,
+            images=images,
+            user=user,
+        )
+    except ValueError as e:
+        # Batch-level validation (price, storage quota) rejects the whole request
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{photo_id}/export")
@@ -4,14 +4,13 @@ import time
 import hashlib
 from urllib.parse import unquote
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+from ..services.file_delivery import deliver
+from ..services.storage import url_to_path
 
 router = APIRouter()
 
 # Sign/verify helpers
 SECRET = os.getenv("DOWNLOAD_SECRET", os.getenv("SECRET_KEY", "change-me"))
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 
 
 def _verify(sig: str, path: str, exp: int) -> bool:
@@ -37,21 +36,20 @@ def secure_download(
     if not _verify(sig, path, exp):
         raise HTTPException(status_code=403, detail="Invalid or expired link")
 
-    # Map to filesystem under uploads only
+    # Map to filesystem under uploads only (flat legacy or sharded URLs)
     path = unquote(path)
-    if not path.startswith("/uploads/"):
+    fs_path = url_to_path(path)
+    if not fs_path:
         raise HTTPException(status_code=400, detail="Invalid path")
-    filename = path.split("/uploads/")[-1]
-    fs_path = os.path.join(UPLOAD_DIR, filename)
+    filename = os.path.basename(fs_path)
 
     if not os.path.isfile(fs_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    # Stream file with sensible headers
-    return FileResponse(
+    # Hand the bytes to the proxy (X-Accel-Redirect / X-Sendfile) or send them ourselves
+    return deliver(
         fs_path,
-        media_type="application/octet-stream",
-        filename=filename,
+        filename,
         headers={
             "Cache-Control": "private, max-age=0, no-store",
             "Content-Security-Policy": "default-src 'none'",
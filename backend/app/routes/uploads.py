@@ -0,0 +1,166 @@
+"""Serving of /uploads: long-lived caching, strong ETags, 304s, ranges and sidecars.
+
+Upload files are never rewritten in place (content-addressed or random
+names), so every response is `Cache-Control: public, max-age=..., immutable`
+and repeat views cost a 304 at most. Content-addressed names carry their
+SHA-256 and use it as the ETag directly; other files are hashed once and the
+tag is cached per (path, mtime, size). Range/If-Range are handled by
+FileResponse. A precompressed sidecar (`<file>.br` / `<file>.gz`) is served
+instead of the file when the client accepts that encoding.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import anyio
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from ..services.storage import URL_PREFIX, UPLOAD_DIR, url_to_path
+
+UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", str(365 * 24 * 3600)))
+UPLOADS_ETAG_CACHE = int(os.getenv("UPLOADS_ETAG_CACHE", "20000"))
+# Sidecar suffix -> Content-Encoding, in order of preference
+SIDECARS = ((".br", "br"), (".gz", "gzip"))
+
+_DIGEST_NAME = re.compile(r"(?:^|_)([0-9a-f]{64})\.[A-Za-z0-9]+$")
+
+
+@dataclass(frozen=True)
+class _Entry:
+    sig: tuple[int, int]  # (mtime_ns, size) the entry was computed for
+    etag: str
+    sidecars: tuple[tuple[str, str], ...]  # (encoding, path) available next to the file
+
+
+class _EntryCache:
+    """LRU of ETags and sidecar availability per served file."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, path: str, sig: tuple[int, int]) -> _Entry | None:
+        with self._lock:
+            entry = self._items.get(path)
+            if entry is None or entry.sig != sig:
+                return None
+            self._items.move_to_end(path)
+            return entry
+
+    def put(self, path: str, entry: _Entry) -> None:
+        with self._lock:
+            self._items[path] = entry
+            self._items.move_to_end(path)
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+_entries = _EntryCache(UPLOADS_ETAG_CACHE)
+
+
+def _compute_entry(path: str, st: os.stat_result) -> _Entry:
+    match = _DIGEST_NAME.search(os.path.basename(path))
+    if match:
+        digest = match.group(1)
+    else:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+    sidecars = tuple((enc, path + suffix) for suffix, enc in SIDECARS if os.path.isfile(path + suffix))
+    return _Entry((st.st_mtime_ns, st.st_size), f'"{digest[:32]}"', sidecars)
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in (header or "").split(","):
+        bits = [b.strip() for b in part.split(";")]
+        q = 1.0
+        for b in bits[1:]:
+            if b.startswith("q="):
+                try:
+                    q = float(b[2:])
+                except ValueError:
+                    q = 0.0
+        if bits[0] and q > 0:
+            accepted.add(bits[0].lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(t.removeprefix("W/") == etag for t in tags)
+
+
+class UploadFiles(StaticFiles):
+    """The /uploads mount: serves sharded and legacy flat URLs, never dotfiles.
+
+    A flat URL whose file was moved by the shard migration (or a sharded URL
+    whose file hasn't been moved yet) is answered from the other location.
+    Temp/ingest files live in dot-directories and are not reachable."""
+
+    def lookup_path(self, path: str) -> tuple[str, os.stat_result | None]:
+        parts = path.replace("\\", "/").split("/")
+        if any(p.startswith(".") for p in parts if p):
+            return "", None
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is None:
+            other = url_to_path(URL_PREFIX + "/".join(parts))
+            if other and os.path.isfile(other):
+                return super().lookup_path(os.path.relpath(other, UPLOAD_DIR))
+        return full_path, stat_result
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        full_path, st = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if st is None or not stat.S_ISREG(st.st_mode):
+            raise HTTPException(status_code=404)
+        sig = (st.st_mtime_ns, st.st_size)
+        entry = _entries.get(full_path, sig)
+        if entry is None:
+            # Hashing a large legacy file must not block the event loop
+            entry = await anyio.to_thread.run_sync(_compute_entry, full_path, st)
+            _entries.put(full_path, entry)
+
+        request_headers = Headers(scope=scope)
+        headers = {"cache-control": f"public, max-age={UPLOADS_MAX_AGE}, immutable"}
+        serve_path, serve_stat, etag = full_path, st, entry.etag
+        if entry.sidecars:
+            headers["vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, sidecar in entry.sidecars:
+                if encoding in accepted:
+                    try:
+                        serve_stat = os.stat(sidecar)
+                    except OSError:
+                        continue
+                    serve_path, etag = sidecar, f'{entry.etag[:-1]}-{encoding}"'
+                    headers["content-encoding"] = encoding
+                    break
+        headers["etag"] = etag
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        # Type of the underlying file, not of a .br/.gz sidecar
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        response = FileResponse(serve_path, stat_result=serve_stat, headers=headers, media_type=media_type)
+        if if_none_match is None and self.is_not_modified(response.headers, request_headers):
+            return Response(status_code=304, headers=headers)
+        return response
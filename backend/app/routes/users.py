@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 from ..database import get_db
 from .auth import get_current_user
 from ..models.profile import Profile
 from ..schemas.profile import ProfileIn, ProfileOut
 from ..schemas.users import PlanChangeRequest, EntitlementsOut
-from ..services.plan_service import get_plan, get_entitlements
+from ..services.plan_service import get_plan, get_entitlements, get_upload_rules
+from ..services.upload_ingest import ingest_upload, UploadTooLarge
 import os
-import uuid
 from ..models.questionnaire import Questionnaire
 from ..schemas.questionnaire import QuestionnaireIn, QuestionnaireOut
 
@@ -87,20 +87,14 @@ def update_my_profile(payload: ProfileIn, db: Session = Depends(get_db), user=De
 
 @router.post("/me/avatar", response_model=ProfileOut)
 async def upload_avatar(avatar: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
-    # Save avatar to uploads and set profile.avatar_url
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # .../app
-    upload_dir = os.path.join(base_dir, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-
+    # Stream avatar to uploads (bounded by plan size limit) and set profile.avatar_url
     ext = os.path.splitext(avatar.filename or "")[1].lower() or ".jpg"
-    filename = f"avatar_{user.id}_{uuid.uuid4().hex}{ext}"
-    file_path = os.path.join(upload_dir, filename)
-
-    content = await avatar.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
-
-    url = f"/uploads/{filename}"
+    _exts, max_bytes, _limit = get_upload_rules(get_plan(user))
+    try:
+        upload = await ingest_upload(avatar, max_bytes, ext)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    _, url = upload.persist(prefix=f"avatar_{user.id}_")
     prof = db.query(Profile).filter(Profile.user_id == user.id).first()
     if not prof:
         prof = Profile(user_id=user.id)
@@ -1,5 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator, model_validator
+from typing import Dict, List, Literal, Optional, Union
+import json
+
+# Ladder order used when building srcset strings (smallest first)
+_SRCSET_ORDER = ("thumb", "card", "large", "full")
 
 class PhotoOut(BaseModel):
     id: int
@@ -16,16 +20,82 @@ class PhotoOut(BaseModel):
     processed_url: Optional[str] = None
     original_url: Optional[str] = None
     bytes_size: Optional[int] = 0
+    # "processing" until the derivatives are rendered, then "ready" (or "failed")
+    status: Optional[str] = "ready"
+    # Earliest near-identical photo (perceptual hash match), if any
+    duplicate_of: Optional[int] = None
+    # Image metadata (None until rendered or backfilled)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    megapixels: Optional[float] = None
+    orientation: Optional[str] = None
+    image_format: Optional[str] = None
+    exif: Optional[Dict[str, Union[int, float, str]]] = None
     owner_name: Optional[str] = None
     owner_avatar_url: Optional[str] = None
+    # Responsive renditions: size -> {"width", "height", <format>: url}
+    derivatives: Optional[Dict[str, Dict[str, Union[int, str]]]] = None
+    # format -> srcset string, e.g. {"webp": "/uploads/a.webp 320w, /uploads/b.webp 640w"}
+    srcset: Optional[Dict[str, str]] = None
 
     class Config:
         from_attributes = True
 
+    @field_validator("derivatives", "exif", mode="before")
+    @classmethod
+    def _parse_json(cls, v):
+        # Stored as a JSON string on the model
+        if isinstance(v, str):
+            try:
+                return json.loads(v) if v else None
+            except ValueError:
+                return None
+        return v
+
+    @model_validator(mode="after")
+    def _build_srcset(self):
+        if self.derivatives and not self.srcset:
+            sets: Dict[str, list] = {}
+            for name in _SRCSET_ORDER:
+                entry = self.derivatives.get(name)
+                if not entry:
+                    continue
+                for fmt, url in entry.items():
+                    if fmt in ("width", "height"):
+                        continue
+                    sets.setdefault(fmt, []).append(f"{url} {entry.get('width')}w")
+            self.srcset = {fmt: ", ".join(parts) for fmt, parts in sets.items()}
+        return self
+
+class PhotoStatusOut(BaseModel):
+    id: int
+    status: str
+    attempts: int = 0
+    max_attempts: int = 0
+    retry_at: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchItemOut(BaseModel):
+    filename: str
+    photo: Optional[PhotoOut] = None
+    error: Optional[str] = None
+
+
+class BatchUploadOut(BaseModel):
+    uploaded: int
+    failed: int
+    items: List[BatchItemOut]
+
+
 class PhotoFilter(BaseModel):
     category: Optional[str] = None
     location: Optional[str] = None
     popularity: Optional[str] = None
+    orientation: Optional[Literal["landscape", "portrait", "square"]] = None
+    min_megapixels: Optional[float] = None
+    max_megapixels: Optional[float] = None
+    image_format: Optional[str] = None
 
 
 class PhotoUpdate(BaseModel):
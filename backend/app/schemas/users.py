@@ -18,6 +18,7 @@ class EntitlementsOut(BaseModel):
     plan: Literal["free", "premium"]
     upload_limit: int
     max_file_mb: int
+    max_megapixels: int
     formats: list[str]
     basic_edits: bool
     filters_basic: bool
@@ -5,6 +5,15 @@ import base64
 import requests
 
 
+def _read_source(source: bytes | str) -> bytes:
+    # Routes hand over the path of the ingested temp file so large inputs are
+    # not pickled across the process pool; read it inside the worker
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    return source
+
+
 class AIService:
     """
     Thin wrapper around external AI APIs.
@@ -25,9 +34,15 @@ class AIService:
         self.upscale_api_url = os.getenv("AI_UPSCALE_API_URL", "")
         self.upscale_api_key = os.getenv("AI_UPSCALE_API_KEY", "")
 
-    def background_remove(self, image_bytes: bytes, filename: str) -> Optional[bytes]:
+    @property
+    def has_bg_provider(self) -> bool:
+        return bool(self.bg_api_url and self.bg_api_key)
+
+    def background_remove(self, source: bytes | str, filename: str, session=None) -> Optional[bytes]:
+        """session: a preloaded rembg session (see model_sessions); without one rembg builds its own."""
+        image_bytes = _read_source(source)
         # If external provider configured, use it first
-        if self.bg_api_url and self.bg_api_key:
+        if self.has_bg_provider:
             try:
                 files = {"image": (filename, image_bytes)}
                 headers = {"Authorization": f"Bearer {self.bg_api_key}"}
@@ -42,13 +57,14 @@ class AIService:
         # Local fallback using rembg (if installed)
         try:
             from rembg import remove  # type: ignore
-            out = remove(image_bytes)
+            out = remove(image_bytes, session=session)
             return out
         except Exception as e:
             print(f"[ai] background_remove fallback failed: {e}")
             return None
 
-    def ai_enhance(self, image_bytes: bytes, filename: str, mode: str = "autofix") -> Optional[bytes]:
+    def ai_enhance(self, source: bytes | str, filename: str, mode: str = "autofix") -> Optional[bytes]:
+        image_bytes = _read_source(source)
         # If external provider configured, try it first
         if self.enhance_api_url and self.enhance_api_key:
             try:
@@ -75,7 +91,8 @@ class AIService:
             print(f"[ai] ai_enhance fallback failed: {e}")
             return None
 
-    def upscale(self, image_bytes: bytes, filename: str, scale: int = 2) -> Optional[bytes]:
+    def upscale(self, source: bytes | str, filename: str, scale: int = 2) -> Optional[bytes]:
+        image_bytes = _read_source(source)
         # If external provider configured, try it first
         if self.upscale_api_url and self.upscale_api_key:
             try:
@@ -105,3 +122,7 @@ class AIService:
         except Exception as e:
             print(f"[ai] upscale fallback failed: {e}")
             return None
+
+
+# Shared instance: configuration is read once, not per request
+ai_service = AIService()
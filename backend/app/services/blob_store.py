@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from sqlalchemy.orm import Session
+
+from ..models.blob import Blob
+from .storage import UPLOAD_DIR, path_for, url_for, url_to_path
+
+
+def _publish(src_path: str, filename: str) -> str:
+    """Atomically move src_path to its sharded upload path unless it already exists."""
+    dest = path_for(filename)
+    if os.path.exists(dest) or os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+        # Already stored (the flat copy is a file not yet migrated)
+        os.remove(src_path)
+    else:
+        os.replace(src_path, dest)
+    return url_for(filename)
+
+
+def put_bytes(data: bytes, ext: str, prefix: str = "") -> str:
+    """Store data under its SHA-256 and return the public URL. Identical bytes share one file."""
+    filename = f"{prefix}{hashlib.sha256(data).hexdigest()}{(ext or '.jpg').lower()}"
+    dest = path_for(filename)
+    if os.path.exists(dest) or os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+        return url_for(filename)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".blob-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return _publish(tmp, filename)
+
+
+def put_file(path: str, digest: str, ext: str) -> str:
+    """Move an already-hashed temp file into the store under its digest."""
+    return _publish(path, f"{digest}{(ext or '.jpg').lower()}")
+
+
+def blob_urls(blob: Blob) -> list[str]:
+    urls = [blob.url] if blob.url else []
+    try:
+        derivatives = json.loads(blob.derivatives) if blob.derivatives else {}
+    except ValueError:
+        derivatives = {}
+    for entry in derivatives.values():
+        urls.extend(v for k, v in entry.items() if k not in ("width", "height"))
+    return list(dict.fromkeys(urls))
+
+
+class BlobStore:
+    """Reference-counted Blob rows on top of the content-addressed files.
+
+    Refcount changes are made in the caller's session so they commit (or roll
+    back) together with the Photo rows that hold the references.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        # Blobs registered in this unit of work but not flushed yet (sessions don't autoflush)
+        self._pending: dict[tuple[str, str], Blob] = {}
+
+    def get(self, digest: str, profile: str) -> Blob | None:
+        pending = self._pending.get((digest, profile))
+        if pending is not None:
+            return pending
+        return self.db.query(Blob).filter(Blob.digest == digest, Blob.profile == profile).first()
+
+    def acquire(self, digest: str, profile: str) -> Blob | None:
+        """Take a reference on an existing blob; None on a dedup miss."""
+        blob = self.get(digest, profile)
+        if blob is None:
+            return None
+        blob.refcount = (blob.refcount or 0) + 1
+        self.db.add(blob)
+        return blob
+
+    def register(self, digest: str, profile: str, url: str | None, derivatives: dict | None = None, size: int = 0) -> Blob:
+        """Record a freshly stored blob holding one reference."""
+        blob = Blob(
+            digest=digest,
+            profile=profile,
+            url=url,
+            derivatives=json.dumps(derivatives) if derivatives else "",
+            size=size,
+            refcount=1,
+        )
+        self.db.add(blob)
+        self._pending[(digest, profile)] = blob
+        return blob
+
+    def release(self, digest: str, profile: str) -> list[str]:
+        """Drop one reference. Returns file paths to unlink once the caller has committed."""
+        blob = self.get(digest, profile)
+        if blob is None:
+            return []
+        blob.refcount = max(0, (blob.refcount or 0) - 1)
+        if blob.refcount > 0:
+            self.db.add(blob)
+            return []
+        paths = [p for p in (url_to_path(u) for u in blob_urls(blob)) if p]
+        self.db.delete(blob)
+        return paths
+
+
+def unlink_quietly(paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+
+class DiskLRUCache:
+    """Size-bounded cache of generated files on local disk.
+
+    Entries are files named by the SHA-256 of their key. An in-memory index
+    (rebuilt from the directory on start, oldest access first) answers hits
+    without touching the filesystem beyond one stat and drives LRU eviction
+    once the total passes max_bytes. get_or_create() is single-flight:
+    concurrent misses for the same key share one producer call.
+    """
+
+    def __init__(self, name: str, directory: str, max_bytes: int):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max(1, max_bytes)
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, tuple[str, int]]" = OrderedDict()  # digest -> (filename, size)
+        self._bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _load(self) -> None:
+        # Lazy so importing the module never touches the disk
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            st = entry.stat()
+            entries.append((st.st_atime, entry.name, st.st_size))
+        for _atime, filename, size in sorted(entries):
+            self._index[filename.split(".", 1)[0]] = (filename, size)
+            self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            _digest, (filename, size) = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def get(self, key: str) -> str | None:
+        """Path of the cached file for key, or None."""
+        digest = self._digest(key)
+        with self._lock:
+            self._load()
+            found = self._index.get(digest)
+            if found is None:
+                return None
+            path = os.path.join(self.directory, found[0])
+            if not os.path.isfile(path):
+                # Removed behind our back
+                del self._index[digest]
+                self._bytes -= found[1]
+                return None
+            self._index.move_to_end(digest)
+            return path
+
+    def put(self, key: str, data: bytes, ext: str = "") -> str:
+        """Store data for key (atomically) and return its path."""
+        digest = self._digest(key)
+        filename = f"{digest}{ext}"
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            self._load()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._index.pop(digest, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._index[digest] = (filename, len(data))
+            self._bytes += len(data)
+            self._evict()
+        return path
+
+    async def get_or_create(self, key: str, produce: Callable[[], Awaitable[tuple[bytes, str]]]) -> str:
+        """Return the cached path for key, calling produce() -> (data, ext) on a miss.
+
+        Only one produce() runs per key at a time; other callers wait for it."""
+        path = self.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.joined += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data, ext = await produce()
+            path = self.put(key, data, ext)
+            future.set_result(path)
+            return path
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unjoined failure doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "joined": self.joined,
+                "evictions": self.evictions,
+                "inflight": len(self._inflight),
+            }
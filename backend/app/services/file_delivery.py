@@ -0,0 +1,109 @@
+"""Hand file downloads to the reverse proxy, or send them with as little copying as possible.
+
+DOWNLOAD_DELIVERY picks who moves the bytes once a route has authorized a
+download:
+
+- "x-accel": an empty response with `X-Accel-Redirect: DOWNLOAD_ACCEL_PREFIX<relpath>`;
+  nginx serves the file from an `internal` location (see frontend/nginx.conf),
+  including ranges, so the API worker is free as soon as the headers are out.
+- "x-sendfile": the same with `X-Sendfile: <absolute path>` (Apache
+  mod_xsendfile, lighttpd, Caddy plugins).
+- "direct" (default, no proxy in front): ZeroCopyFileResponse. Whole files
+  and single ranges go out through the server's zero-copy send extension
+  when it offers one; otherwise FileResponse streams them (with pathsend
+  when available, full Range/If-Range and multipart ranges either way).
+"""
+import os
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from .storage import UPLOAD_DIR
+
+DOWNLOAD_DELIVERY = os.getenv("DOWNLOAD_DELIVERY", "direct").strip().lower()
+DOWNLOAD_ACCEL_PREFIX = "/" + os.getenv("DOWNLOAD_ACCEL_PREFIX", "/_protected/uploads/").strip("/") + "/"
+
+# ASGI extension (e.g. Hypercorn/Granian-style servers) handing an fd to the server's sendfile()
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """FileResponse that uses the zero-copy send extension for whole files and single ranges.
+
+    Anything else (HEAD, multipart ranges, malformed or unsatisfiable ranges,
+    servers without the extension) is left to FileResponse unchanged."""
+
+    def _zero_copy_span(self, scope: Scope, size: int) -> tuple[int, int] | None:
+        headers = Headers(scope=scope)
+        http_range = headers.get("range")
+        if_range = headers.get("if-range")
+        if http_range is None or (if_range is not None and not self._should_use_range(if_range)):
+            return 0, size
+        try:
+            ranges = self._parse_range_header(http_range, size)
+        except Exception:
+            return None  # FileResponse answers 400/416
+        return ranges[0] if len(ranges) == 1 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"].upper() == "HEAD"
+            or self.status_code != 200
+            or ZEROCOPY_EXTENSION not in scope.get("extensions", {})
+        ):
+            await super().__call__(scope, receive, send)
+            return
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            self.set_stat_headers(self.stat_result)
+        size = self.stat_result.st_size
+        span = self._zero_copy_span(scope, size)
+        if span is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = span
+        headers = MutableHeaders(raw=list(self.raw_headers))
+        status = 200
+        if (start, end) != (0, size):
+            status = 206
+            headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            headers["content-length"] = str(end - start)
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": headers.raw})
+            await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": start, "count": end - start,
+                        "more_body": False})
+        finally:
+            file.close()
+        if self.background is not None:
+            await self.background()
+
+
+def deliver(fs_path: str, filename: str, headers: dict | None = None,
+            media_type: str = "application/octet-stream") -> Response:
+    """Response that sends fs_path (a file under UPLOAD_DIR) as an attachment, per DOWNLOAD_DELIVERY."""
+    if DOWNLOAD_DELIVERY not in ("x-accel", "x-sendfile"):
+        return ZeroCopyFileResponse(fs_path, media_type=media_type, filename=filename, headers=headers)
+    out = dict(headers or {})
+    out["Content-Disposition"] = _content_disposition(filename)
+    if DOWNLOAD_DELIVERY == "x-accel":
+        relpath = os.path.relpath(fs_path, UPLOAD_DIR).replace(os.sep, "/")
+        out["X-Accel-Redirect"] = DOWNLOAD_ACCEL_PREFIX + quote(relpath)
+    else:
+        out["X-Sendfile"] = os.path.abspath(fs_path)
+    return Response(status_code=200, headers=out, media_type=media_type)
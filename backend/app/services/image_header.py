@@ -0,0 +1,120 @@
+"""Identify an image by its magic bytes and read its dimensions without decoding it.
+
+Used as the upload preflight: a few small reads from the start of the file
+(plus seeks for JPEG segment headers and the TIFF IFD) tell us the real
+format and the pixel count, so renamed files and decompression bombs are
+rejected before Pillow ever sees them.
+"""
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+HEAD_BYTES = 32
+# JPEG start-of-frame markers (every SOFn except DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Bound on JPEG segments walked before SOF (EXIF, ICC, XMP... are a handful)
+_MAX_JPEG_SEGMENTS = 256
+
+# Real format -> file extensions it may be uploaded as (first one is canonical)
+FORMAT_EXTS = {
+    "jpeg": (".jpg", ".jpeg"),
+    "png": (".png",),
+    # Most camera raw formats (DNG, NEF, CR2, ARW...) are TIFF containers
+    "tiff": (".tif", ".tiff", ".raw"),
+    "psd": (".psd",),
+}
+
+
+class UnrecognizedImage(ValueError):
+    """The file does not start like any image format we accept, or its header is corrupt."""
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def ext_for(self, claimed: str) -> str:
+        """The claimed extension if it fits the real format, else the format's canonical one."""
+        exts = FORMAT_EXTS[self.format]
+        return claimed if claimed in exts else exts[0]
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise UnrecognizedImage("Truncated image header")
+    return data
+
+
+def _jpeg_size(f: BinaryIO) -> tuple[int, int]:
+    f.seek(2)
+    for _ in range(_MAX_JPEG_SEGMENTS):
+        marker = _read_exact(f, 2)
+        while marker[0] == 0xFF and marker[1] == 0xFF:  # fill bytes
+            marker = marker[1:] + _read_exact(f, 1)
+        if marker[0] != 0xFF:
+            raise UnrecognizedImage("Corrupt JPEG segment")
+        code = marker[1]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue  # standalone markers carry no length
+        if code in (0xD9, 0xDA):
+            break  # end of image / start of scan before any frame header
+        (length,) = struct.unpack(">H", _read_exact(f, 2))
+        if length < 2:
+            raise UnrecognizedImage("Corrupt JPEG segment")
+        if code in _SOF_MARKERS:
+            _precision, height, width = struct.unpack(">BHH", _read_exact(f, 5))
+            return width, height
+        f.seek(length - 2, 1)
+    raise UnrecognizedImage("JPEG has no frame header")
+
+
+def _tiff_size(f: BinaryIO, head: bytes) -> tuple[int, int]:
+    order = "<" if head[:2] == b"II" else ">"
+    (ifd,) = struct.unpack(order + "I", head[4:8])
+    f.seek(ifd)
+    (count,) = struct.unpack(order + "H", _read_exact(f, 2))
+    entries = _read_exact(f, 12 * count)
+    dims = {}
+    for i in range(count):
+        tag, typ, n = struct.unpack(order + "HHI", entries[12 * i:12 * i + 8])
+        if tag in (256, 257) and n == 1:  # ImageWidth, ImageLength
+            value = entries[12 * i + 8:12 * i + 12]
+            if typ == 3:  # SHORT, left-justified in the value field
+                dims[tag] = struct.unpack(order + "H", value[:2])[0]
+            elif typ == 4:  # LONG
+                dims[tag] = struct.unpack(order + "I", value)[0]
+    if 256 not in dims or 257 not in dims:
+        raise UnrecognizedImage("TIFF has no image dimensions")
+    return dims[256], dims[257]
+
+
+def read_header(f: BinaryIO) -> ImageHeader:
+    """Sniff the format and size of the image in a seekable binary file (read from offset 0).
+
+    Raises UnrecognizedImage for anything that is not a JPEG, PNG, TIFF or PSD
+    with a well-formed header."""
+    f.seek(0)
+    head = f.read(HEAD_BYTES)
+    try:
+        if head[:3] == b"\xff\xd8\xff":
+            fmt, (width, height) = "jpeg", _jpeg_size(f)
+        elif head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            fmt, (width, height) = "png", struct.unpack(">II", head[16:24])
+        elif head[:4] in (b"II*\x00", b"MM\x00*"):
+            fmt, (width, height) = "tiff", _tiff_size(f, head)
+        elif head[:4] == b"8BPS" and len(head) >= 22:
+            fmt, (height, width) = "psd", struct.unpack(">II", head[14:22])
+        else:
+            raise UnrecognizedImage("Not a supported image format")
+    except struct.error:
+        raise UnrecognizedImage("Truncated image header")
+    if width <= 0 or height <= 0:
+        raise UnrecognizedImage("Image has no pixels")
+    return ImageHeader(fmt, width, height)
@@ -0,0 +1,327 @@
+"""Pillow image pipeline steps used by uploads.
+
+Everything here is a plain module-level function so it can be shipped to the
+image process pool (see process_pool.py). Sources are a file path (preferred:
+nothing large crosses the process boundary) or raw bytes. Each upload is
+decoded once and encoded once (see render_web).
+"""
+import os
+from io import BytesIO
+from .watermark_assets import watermark_assets
+
+try:
+    from PIL import Image, ImageDraw, features
+    PIL_AVAILABLE = True
+except Exception:
+    PIL_AVAILABLE = False
+
+
+WEB_MAX_SIDE = 1600
+WEB_QUALITY = 82
+
+# Responsive ladder: name -> longest side in px. "full" doubles as processed_url.
+DERIVATIVE_SIZES = (("full", WEB_MAX_SIDE), ("large", 1280), ("card", 640), ("thumb", 320))
+# Modern formats rendered next to the JPEG/PNG fallback when Pillow supports them
+DERIVATIVE_FORMATS = [f.strip().lower() for f in os.getenv("DERIVATIVE_FORMATS", "webp,avif").split(",") if f.strip()]
+FORMAT_EXT = {"jpeg": ".jpg", "png": ".png", "webp": ".webp", "avif": ".avif"}
+FORMAT_MEDIA_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp", "avif": "image/avif"}
+FORMAT_QUALITY = {"webp": 80, "avif": 60}
+FORMAT_OPTIONS = {"webp": {"method": 4}, "avif": {"speed": 8}}
+
+
+def enabled_formats() -> list[str]:
+    if not PIL_AVAILABLE:
+        return []
+    return [f for f in DERIVATIVE_FORMATS if f in FORMAT_EXT and f not in ("jpeg", "png") and features.check(f)]
+
+
+def _fit_size(size: tuple[int, int], max_side: int) -> tuple[int, int]:
+    w, h = size
+    ratio = min(max_side / w, max_side / h, 1.0)
+    return max(1, int(w * ratio)), max(1, int(h * ratio))
+
+
+def _watermark_in_place(im) -> None:
+    """Draw the centered logo (or text fallback) onto an RGB image at its current size."""
+    try:
+        # Scale logo to ~35% of min(image width,height); cached per width bucket
+        base = min(im.width, im.height)
+        logo = watermark_assets.logo_for(max(96, int(base * 0.35)))
+        if logo is not None:
+            x = (im.width - logo.width) // 2
+            y = (im.height - logo.height) // 2
+            im.paste(logo, (x, y), logo)
+            return
+    except Exception as e:
+        print(f"[watermark] logo overlay failed: {e}; using text fallback")
+
+    draw = ImageDraw.Draw(im)
+    # Text fallback: size ~10% of min dimension
+    font_size = max(24, int(min(im.width, im.height) * 0.10)) // 4 * 4
+    font = watermark_assets.font(font_size)
+    text = "ClickScapeIndia"
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    x = (im.width - text_w) // 2
+    y = (im.height - text_h) // 2
+    # Shadow
+    shadow = max(2, font_size // 20)
+    draw.text((x + shadow, y + shadow), text, font=font, fill=(0, 0, 0))
+    draw.text((x, y), text, font=font, fill=(255, 255, 255))
+
+
+def _open(source: bytes | str):
+    return Image.open(source if isinstance(source, str) else BytesIO(source))
+
+
+def _read(source: bytes | str) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    return source
+
+
+def _decode_web(im, watermark: bool):
+    """Decoded RGB (or L) copy of im fitted to WEB_MAX_SIDE, watermarked if asked.
+
+    JPEGs are decoded in draft mode so the DCT scaler does most of the
+    downscaling (1/2, 1/4, 1/8) before any pixels are materialized; the final
+    LANCZOS step uses reducing_gap to box-reduce first for other formats.
+    """
+    target = _fit_size(im.size, WEB_MAX_SIDE)
+    if im.format == "JPEG":
+        im.draft("RGB", target)
+    keep_gray = (not watermark) and im.mode == "L"
+    out = im if keep_gray or im.mode == "RGB" else im.convert("RGB")
+    if out.size != target:
+        out = out.resize(target, Image.LANCZOS, reducing_gap=3.0)
+    if out is im:
+        out = out.copy()
+    if watermark:
+        _watermark_in_place(out)
+    return out
+
+
+def primary_format(orig_ext: str) -> str:
+    """Fallback format every client can display: PNG stays PNG, everything else JPEG."""
+    return "png" if (orig_ext or ".jpg").lower() in (".png", ".webp") else "jpeg"
+
+
+def _encode(im, fmt: str) -> bytes:
+    buf = BytesIO()
+    if fmt == "png":
+        im.save(buf, format="PNG", optimize=True)
+    elif fmt == "jpeg":
+        im.save(buf, format="JPEG", quality=WEB_QUALITY, optimize=True)
+    else:
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.save(buf, format=fmt.upper(), quality=FORMAT_QUALITY[fmt], **FORMAT_OPTIONS.get(fmt, {}))
+    return buf.getvalue()
+
+
+def probe(source: bytes | str) -> tuple[str, int, int]:
+    """Parse just the image header. Returns (format, width, height); raises on unreadable input."""
+    if not PIL_AVAILABLE:
+        return "", 0, 0
+    with _open(source) as im:
+        return im.format or "", im.width, im.height
+
+
+def dhash(source: bytes | str) -> str:
+    """64-bit difference hash as 16 hex chars: survives resizing, recompression and small edits.
+
+    Each bit says whether a pixel of the 9x8 grayscale thumbnail is brighter
+    than its right-hand neighbour. JPEGs are draft-decoded at 1/8 scale."""
+    with _open(source) as im:
+        if im.format == "JPEG":
+            im.draft("L", (64, 64))
+        small = im.convert("L").resize((9, 8), Image.BILINEAR, reducing_gap=2.0)
+        px = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def render_web(source: bytes | str, orig_ext: str, watermark: bool) -> tuple[bytes, str]:
+    """Decode once, downscale to WEB_MAX_SIDE, optionally watermark, encode once.
+    Returns (image_bytes, new_ext) where new_ext includes the leading dot."""
+    if not PIL_AVAILABLE:
+        return _read(source), orig_ext or ".jpg"
+    try:
+        with _open(source) as im:
+            out = _decode_web(im, watermark)
+            fmt = primary_format(orig_ext)
+            return _encode(out, fmt), FORMAT_EXT[fmt]
+    except Exception as e:
+        print(f"[render] failed: {e}; returning original")
+    return _read(source), (orig_ext or ".jpg")
+
+
+# EXIF tags kept in photos.exif: tag id -> key (IFD0 and the Exif sub-IFD)
+EXIF_TAGS = {
+    0x010F: "make", 0x0110: "model", 0x0112: "orientation", 0x9003: "taken_at",
+    0x8827: "iso", 0x829A: "exposure_time", 0x829D: "f_number", 0x920A: "focal_length", 0xA434: "lens",
+}
+_EXIF_IFD = 0x8769
+
+
+def _exif_value(value):
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "ignore")
+    if isinstance(value, str):
+        value = value.strip("\x00 ")
+        return value[:128] or None
+    if isinstance(value, tuple):
+        value = value[0] if value else None
+    try:
+        number = float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return int(number) if number.is_integer() else round(number, 6)
+
+
+def _metadata(im) -> dict:
+    """Dimensions, format and selected EXIF of an opened image (header only, no decode)."""
+    meta = {"width": im.width, "height": im.height, "format": (im.format or "").lower(), "exif": {}}
+    try:
+        exif = im.getexif()
+        tags = dict(exif)
+        tags.update(exif.get_ifd(_EXIF_IFD))
+    except Exception as e:
+        print(f"[metadata] unreadable EXIF: {e}")
+        return meta
+    for tag, key in EXIF_TAGS.items():
+        if tag in tags:
+            value = _exif_value(tags[tag])
+            if value is not None:
+                meta["exif"][key] = value
+    return meta
+
+
+def image_metadata(source: bytes | str) -> dict:
+    """{"width", "height", "format", "exif": {...}} of an image, from its header."""
+    with _open(source) as im:
+        return _metadata(im)
+
+
+def _render_ladder(im, orig_ext: str, watermark: bool) -> dict:
+    formats = [primary_format(orig_ext)] + enabled_formats()
+    out: dict = {}
+    level = _decode_web(im, watermark)
+    for name, side in DERIVATIVE_SIZES:
+        size = _fit_size(level.size, side)
+        if out and size == level.size:
+            continue
+        if size != level.size:
+            level = level.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        out[name] = {
+            "width": level.width,
+            "height": level.height,
+            "files": {fmt: _encode(level, fmt) for fmt in formats},
+        }
+    return out
+
+
+def render_derivatives(source: bytes | str, orig_ext: str, watermark: bool) -> dict:
+    """Render the responsive ladder (DERIVATIVE_SIZES) in every enabled format.
+
+    The source is decoded once at "full" size (watermarked there if asked, so
+    smaller sizes inherit a proportionally scaled mark) and each smaller size is
+    resized from the previous one. Sizes that would not be smaller than the one
+    above (small sources) are skipped. Returns
+    {name: {"width": w, "height": h, "files": {fmt: bytes}}} in ladder order.
+    """
+    if not PIL_AVAILABLE:
+        return {}
+    with _open(source) as im:
+        return _render_ladder(im, orig_ext, watermark)
+
+
+def render_upload(source: bytes | str, orig_ext: str, watermark: bool) -> tuple[dict, dict]:
+    """render_derivatives plus image_metadata from the same open (read before draft
+    decoding changes the reported size). Returns (derivatives, metadata)."""
+    if not PIL_AVAILABLE:
+        return {}, {}
+    with _open(source) as im:
+        meta = _metadata(im)
+        return _render_ladder(im, orig_ext, watermark), meta
+
+
+def render_transform(source: bytes | str, width: int, height: int, fit: str, fmt: str, quality: int) -> bytes:
+    """Resize (and for fit="cover", center-crop) a stored rendition for /img.
+
+    width/height of 0 mean "derive from the aspect ratio". "contain" fits
+    inside the box, "cover" fills it exactly. Never upscales: the source is
+    already the largest public rendition.
+    """
+    with _open(source) as im:
+        sw, sh = im.size
+        if fit == "cover" and width and height:
+            scale = min(1.0, max(width / sw, height / sh))
+            target = (max(1, round(sw * scale)), max(1, round(sh * scale)))
+            box_w, box_h = min(width, target[0]), min(height, target[1])
+        else:
+            ratios = [r for r in ((width / sw) if width else 0, (height / sh) if height else 0) if r]
+            scale = min(ratios + [1.0])
+            target = (max(1, int(sw * scale)), max(1, int(sh * scale)))
+            box_w, box_h = target
+        if im.format == "JPEG":
+            im.draft("RGB", target)
+        out = im if im.mode in ("RGB", "L") else im.convert("RGB")
+        if out.size != target:
+            out = out.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        if (box_w, box_h) != out.size:
+            left = (out.width - box_w) // 2
+            top = (out.height - box_h) // 2
+            out = out.crop((left, top, left + box_w, top + box_h))
+        buf = BytesIO()
+        if fmt == "png":
+            out.save(buf, format="PNG", optimize=True)
+        elif fmt == "jpeg":
+            out.save(buf, format="JPEG", quality=quality, optimize=True)
+        else:
+            if out.mode != "RGB":
+                out = out.convert("RGB")
+            out.save(buf, format=fmt.upper(), quality=quality, **FORMAT_OPTIONS.get(fmt, {}))
+        return buf.getvalue()
+
+
+def render_free(source: bytes | str, orig_ext: str) -> tuple[bytes, str]:
+    """Free tier: watermarked, web-optimized copy."""
+    return render_web(source, orig_ext, watermark=True)
+
+
+def render_preview(source: bytes | str, orig_ext: str) -> tuple[bytes, str]:
+    """Premium: web-sized preview without watermark (the original is stored separately)."""
+    return render_web(source, orig_ext, watermark=False)
+
+
+def negotiate_format(accept: str, available: list[str]) -> str | None:
+    """Pick the best of the available formats for an Accept header.
+
+    Modern formats win when the client lists them (avif > webp); otherwise the
+    JPEG/PNG fallback is used. Entries with q=0 are treated as refused.
+    """
+    accepted = {}
+    for part in (accept or "").split(","):
+        bits = [b.strip() for b in part.split(";")]
+        if not bits[0]:
+            continue
+        q = 1.0
+        for b in bits[1:]:
+            if b.startswith("q="):
+                try:
+                    q = float(b[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[bits[0].lower()] = q
+    for fmt in ("avif", "webp"):
+        if fmt in available and accepted.get(FORMAT_MEDIA_TYPES[fmt], 0) > 0:
+            return fmt
+    for fmt in ("jpeg", "png"):
+        if fmt in available:
+            return fmt
+    return available[0] if available else None
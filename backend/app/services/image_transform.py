@@ -0,0 +1,132 @@
+"""On-demand resizes/crops of stored renditions, served by GET /img/{photo_id}.
+
+Any parameter set on the whitelist (IMG_ALLOWED_WIDTHS/HEIGHTS/QUALITIES) is
+accepted as is; anything else needs `sig`, an HMAC of the photo id and the
+canonical parameters (see sign()), so clients cannot mint unbounded variants.
+Results live in a DiskLRUCache keyed by the content-addressed source URL, so
+a re-rendered photo never serves stale bytes.
+"""
+import hashlib
+import hmac
+import json
+import os
+from dataclasses import dataclass
+
+from ..models.photo import Photo
+from . import image_processing, metrics
+from .disk_cache import DiskLRUCache
+from .process_pool import image_pool
+from .storage import APP_DIR, url_to_path
+
+IMG_CACHE_DIR = os.getenv("IMG_CACHE_DIR", os.path.join(APP_DIR, "cache", "img"))
+IMG_CACHE_MAX_MB = int(os.getenv("IMG_CACHE_MAX_MB", "512"))
+IMG_SIGNING_SECRET = os.getenv("IMG_SIGNING_SECRET", os.getenv("DOWNLOAD_SECRET", os.getenv("SECRET_KEY", "change-me")))
+
+
+def _int_list(name: str, default: str) -> frozenset[int]:
+    return frozenset(int(x) for x in os.getenv(name, default).split(",") if x.strip())
+
+
+ALLOWED_WIDTHS = _int_list("IMG_ALLOWED_WIDTHS", "64,128,160,240,320,480,640,800,960,1080,1280,1600")
+ALLOWED_HEIGHTS = _int_list("IMG_ALLOWED_HEIGHTS", "64,128,160,240,320,480,640,800,960,1080,1280,1600")
+ALLOWED_QUALITIES = _int_list("IMG_ALLOWED_QUALITIES", "50,60,70,75,80,85,90")
+FITS = ("contain", "cover")
+FORMATS = ("auto", "jpeg", "png", "webp", "avif")
+DEFAULT_QUALITY = {"jpeg": image_processing.WEB_QUALITY, "png": 0, **image_processing.FORMAT_QUALITY}
+
+transform_cache = DiskLRUCache("img", IMG_CACHE_DIR, IMG_CACHE_MAX_MB * 1024 * 1024)
+metrics.register("img_cache", transform_cache.stats)
+
+
+@dataclass(frozen=True)
+class TransformParams:
+    w: int = 0
+    h: int = 0
+    fit: str = "contain"
+    fmt: str = "auto"
+    q: int = 0  # 0 = the format's default quality
+
+    def canonical(self) -> str:
+        return f"w={self.w}&h={self.h}&fit={self.fit}&fmt={self.fmt}&q={self.q}"
+
+    @property
+    def whitelisted(self) -> bool:
+        return ((not self.w or self.w in ALLOWED_WIDTHS)
+                and (not self.h or self.h in ALLOWED_HEIGHTS)
+                and (not self.q or self.q in ALLOWED_QUALITIES))
+
+
+def sign(photo_id: int, params: TransformParams) -> str:
+    msg = f"{photo_id}|{params.canonical()}".encode()
+    return hmac.new(IMG_SIGNING_SECRET.encode(), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def parse(photo_id: int, w: int, h: int, fit: str, fmt: str, q: int, sig: str | None) -> TransformParams:
+    """Validate request parameters. ValueError for bad values, PermissionError for
+    an off-whitelist set without a valid signature."""
+    fit, fmt = (fit or "contain").lower(), (fmt or "auto").lower()
+    if fit not in FITS:
+        raise ValueError(f"fit must be one of: {', '.join(FITS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of: {', '.join(FORMATS)}")
+    limit = image_processing.WEB_MAX_SIDE
+    if not (0 <= w <= limit and 0 <= h <= limit):
+        raise ValueError(f"w and h must be between 1 and {limit}")
+    if not (0 <= q <= 100):
+        raise ValueError("q must be between 1 and 100")
+    params = TransformParams(w=w, h=h, fit=fit, fmt=fmt, q=q)
+    if not params.whitelisted and not (sig and hmac.compare_digest(sign(photo_id, params), sig)):
+        raise PermissionError("Unsupported parameters; request a signed URL")
+    return params
+
+
+def _pick_source(photo: Photo, params: TransformParams) -> tuple[str, str] | None:
+    """Smallest stored rendition that still covers the requested box: (url, path)."""
+    try:
+        derivatives = json.loads(photo.derivatives) if photo.derivatives else {}
+    except ValueError:
+        derivatives = {}
+    fallback = image_processing.primary_format(os.path.splitext(photo.processed_url or "")[1])
+    candidates = []
+    for entry in derivatives.values():
+        url = entry.get(fallback) or entry.get("jpeg") or entry.get("png")
+        if url:
+            candidates.append((entry.get("width") or 0, entry.get("height") or 0, url))
+    candidates.sort()
+    for width, height, url in candidates:
+        if width >= params.w and height >= params.h:
+            break
+    else:
+        # Nothing big enough (or a legacy photo): use the largest we have
+        url = candidates[-1][2] if candidates else (photo.processed_url or photo.url or "")
+    path = url_to_path(url)
+    if not path or not os.path.isfile(path):
+        return None
+    return url, path
+
+
+def resolve_format(params: TransformParams, accept: str) -> str:
+    if params.fmt != "auto":
+        return params.fmt
+    available = ["jpeg"] + image_processing.enabled_formats()
+    return image_processing.negotiate_format(accept, available) or "jpeg"
+
+
+async def transform(photo: Photo, params: TransformParams, accept: str = "") -> tuple[str, str] | None:
+    """Path of the transformed image (rendering it on a cache miss) and its format.
+    None when the photo has no stored rendition to work from."""
+    source = _pick_source(photo, params)
+    if source is None:
+        return None
+    url, path = source
+    fmt = resolve_format(params, accept)
+    if fmt in ("avif", "webp") and fmt not in image_processing.enabled_formats():
+        raise ValueError(f"{fmt} output is not available on this server")
+    quality = params.q or DEFAULT_QUALITY.get(fmt, image_processing.WEB_QUALITY)
+    key = f"{url}|{params.w}x{params.h}|{params.fit}|{fmt}|{quality}"
+
+    async def produce():
+        data = await image_pool.run(image_processing.render_transform, path, params.w, params.h, params.fit, fmt, quality)
+        return data, image_processing.FORMAT_EXT[fmt]
+
+    return await transform_cache.get_or_create(key, produce), fmt
@@ -0,0 +1,279 @@
+"""Durable background jobs stored in the `jobs` table on DATABASE_URL.
+
+Producers enqueue() a job in their own session so it commits together with
+the rows it refers to. Workers claim jobs with a conditional UPDATE (safe with
+several worker processes on the same database), run the registered handler
+and either mark the job done or schedule a retry with exponential backoff.
+After max_attempts a job is dead-lettered (status 'dead') and the handler's
+on_dead hook runs.
+
+JOB_QUEUE_MODE selects who runs the jobs:
+  - embedded: worker tasks inside the API process (started by the app lifespan)
+  - external: the API only enqueues; run `python -m app.worker` separately
+  - inline:   jobs run inside the request that enqueued them
+In embedded mode, if the workers are not running (e.g. a TestClient used
+without its context manager) jobs also run inline so nothing is stranded.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.job import Job
+from . import metrics
+
+JOB_QUEUE_MODE = os.getenv("JOB_QUEUE_MODE", "embedded").lower()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(os.cpu_count() or 2)))
+JOB_POLL_SECS = float(os.getenv("JOB_POLL_SECS", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECS = float(os.getenv("JOB_RETRY_BASE_SECS", "5"))
+JOB_RETRY_MAX_SECS = float(os.getenv("JOB_RETRY_MAX_SECS", "600"))
+# A 'running' job whose worker has been silent this long is assumed dead and requeued
+JOB_LOCK_TIMEOUT_SECS = int(os.getenv("JOB_LOCK_TIMEOUT_SECS", "600"))
+
+
+@dataclass
+class _Handler:
+    run: Callable[[Session, dict], Awaitable[None]]
+    on_dead: Optional[Callable[[Session, dict, str], None]] = None
+
+
+_handlers: dict[str, _Handler] = {}
+
+
+def register(kind: str, run: Callable[[Session, dict], Awaitable[None]],
+             on_dead: Optional[Callable[[Session, dict, str], None]] = None) -> None:
+    """Register the coroutine that processes jobs of `kind`.
+
+    on_dead(db, payload, error) runs in a fresh session when the job is dead-lettered."""
+    _handlers[kind] = _Handler(run, on_dead)
+
+
+def enqueue(db: Session, kind: str, payload: dict, ref: str = "", max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    """Add a job to the caller's session; it becomes visible when the caller commits."""
+    job = Job(kind=kind, ref=ref or None, payload=json.dumps(payload), status="queued",
+              attempts=0, max_attempts=max(1, max_attempts), run_after=0)
+    db.add(job)
+    return job
+
+
+def latest_for(db: Session, ref: str) -> Job | None:
+    return db.query(Job).filter(Job.ref == ref).order_by(Job.id.desc()).first()
+
+
+def _worker_id(n: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{n}"
+
+
+def _claim(db: Session, worker_id: str, job_id: int | None = None) -> Job | None:
+    """Atomically move one due job from queued to running and return it."""
+    now = int(time.time())
+    for _ in range(5):
+        q = db.query(Job.id).filter(Job.status == "queued")
+        if job_id is not None:
+            q = q.filter(Job.id == job_id)
+        else:
+            q = q.filter(Job.run_after <= now)
+        candidate = q.order_by(Job.run_after, Job.id).limit(1).scalar()
+        if candidate is None:
+            return None
+        res = db.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == "queued")
+            .values(status="running", locked_by=worker_id, locked_at=now,
+                    attempts=Job.attempts + 1, updated_at=now)
+        )
+        db.commit()
+        if res.rowcount == 1:
+            return db.get(Job, candidate)
+        # Another worker won the race; try the next one
+    return None
+
+
+def requeue_stale(db: Session) -> int:
+    """Return jobs stuck in 'running' (crashed worker) to the queue."""
+    now = int(time.time())
+    res = db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.locked_at < now - JOB_LOCK_TIMEOUT_SECS)
+        .values(status="queued", locked_by=None, run_after=now, updated_at=now)
+    )
+    db.commit()
+    return res.rowcount
+
+
+def requeue_dead(db: Session, kind: str | None = None) -> int:
+    """Give dead-lettered jobs a fresh set of attempts."""
+    now = int(time.time())
+    stmt = update(Job).where(Job.status == "dead")
+    if kind:
+        stmt = stmt.where(Job.kind == kind)
+    res = db.execute(stmt.values(status="queued", attempts=0, run_after=now, locked_by=None, updated_at=now))
+    db.commit()
+    return res.rowcount
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_MAX_SECS, JOB_RETRY_BASE_SECS * (2 ** max(0, attempts - 1)))
+
+
+async def _execute(job_id: int) -> None:
+    """Run a claimed job and record the outcome."""
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        kind, payload = job.kind, json.loads(job.payload or "{}")
+        handler = _handlers.get(kind)
+        error = ""
+        try:
+            if handler is None:
+                raise RuntimeError(f"no handler registered for job kind '{kind}'")
+            await handler.run(db, payload)
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {e}"
+            print(f"[jobs] {kind} #{job_id} attempt failed: {error}")
+            if os.getenv("JOB_TRACEBACKS"):
+                traceback.print_exc()
+        job = db.get(Job, job_id)
+        now = int(time.time())
+        job.updated_at = now
+        job.locked_by = None
+        if not error:
+            job.status = "done"
+            job.last_error = ""
+        elif job.attempts >= (job.max_attempts or 1):
+            job.status = "dead"
+            job.last_error = error
+        else:
+            job.status = "queued"
+            job.last_error = error
+            job.run_after = now + int(_retry_delay(job.attempts))
+        dead, attempts = job.status == "dead", job.attempts
+        db.commit()
+    if dead:
+        print(f"[jobs] {kind} #{job_id} dead-lettered after {attempts} attempts")
+    if dead and handler is not None and handler.on_dead is not None:
+        with SessionLocal() as db:
+            try:
+                handler.on_dead(db, payload, error)
+            except Exception as e:
+                db.rollback()
+                print(f"[jobs] on_dead for {kind} #{job_id} failed: {e}")
+
+
+async def run_next(worker_id: str) -> bool:
+    """Claim and run the next due job. Returns False when the queue is empty."""
+    with SessionLocal() as db:
+        job = _claim(db, worker_id)
+        job_id = job.id if job else None
+    if job_id is None:
+        return False
+    await _execute(job_id)
+    return True
+
+
+async def run_jobs(job_ids: list[int]) -> None:
+    """Run specific queued jobs now, concurrently (inline mode)."""
+    gate = asyncio.Semaphore(job_workers.count)
+
+    async def one(job_id: int):
+        async with gate:
+            with SessionLocal() as db:
+                claimed = _claim(db, _worker_id(), job_id=job_id)
+            if claimed is not None:
+                await _execute(job_id)
+
+    await asyncio.gather(*(one(j) for j in job_ids))
+
+
+class JobWorkers:
+    """Worker tasks that poll the queue inside the current event loop."""
+
+    def __init__(self, count: int = JOB_WORKERS, poll_secs: float = JOB_POLL_SECS):
+        self.count = max(1, count)
+        self.poll_secs = poll_secs
+        self._tasks: list[asyncio.Task] = []
+        self._wake: asyncio.Event | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        with SessionLocal() as db:
+            stale = requeue_stale(db)
+        if stale:
+            print(f"[jobs] requeued {stale} stale job(s)")
+        self._tasks = [asyncio.create_task(self._loop(_worker_id(n))) for n in range(self.count)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        # Let in-flight jobs finish; anything cut short is requeued as stale later
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after an enqueue from this process."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _loop(self, worker_id: str) -> None:
+        last_sweep = time.monotonic()
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                ran = await run_next(worker_id)
+            except Exception as e:
+                print(f"[jobs] worker {worker_id} error: {e}")
+                ran = False
+            if ran:
+                continue
+            if time.monotonic() - last_sweep > JOB_LOCK_TIMEOUT_SECS / 2:
+                last_sweep = time.monotonic()
+                with SessionLocal() as db:
+                    requeue_stale(db)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_secs)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_workers = JobWorkers()
+
+
+async def dispatch(job_ids: list[int]) -> None:
+    """Hand freshly committed jobs to whoever runs them in the current mode."""
+    if not job_ids:
+        return
+    if JOB_QUEUE_MODE == "inline" or (JOB_QUEUE_MODE == "embedded" and not job_workers.running):
+        await run_jobs(job_ids)
+    else:
+        job_workers.notify()
+
+
+def _stats() -> dict:
+    with SessionLocal() as db:
+        counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    return {
+        "mode": JOB_QUEUE_MODE,
+        "workers": job_workers.count if job_workers.running else 0,
+        **{s: counts.get(s, 0) for s in ("queued", "running", "done", "dead")},
+    }
+
+
+metrics.register("jobs", _stats)
@@ -0,0 +1,18 @@
+from typing import Callable, Dict
+
+# name -> zero-arg callable returning a JSON-serializable dict
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]) -> None:
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    out = {}
+    for name, source in _sources.items():
+        try:
+            out[name] = source()
+        except Exception as e:
+            out[name] = {"error": str(e)}
+    return out
@@ -0,0 +1,159 @@
+"""Process-wide pools of preloaded ML model sessions (rembg / onnxruntime).
+
+Creating an ONNX session reads the model file and builds the graph, which
+takes seconds; doing it inside a request puts that on the user's latency.
+A ModelSessionPool loads `size` sessions once (on a background thread at
+startup, see main.lifespan), runs a warm-up inference on each and then lends
+them out to requests. Inference runs on a thread: onnxruntime releases the
+GIL, and each session gets intra_op threads = cores / sessions so concurrent
+requests don't oversubscribe the CPU.
+
+`ready` / GET /ai/ready report whether the pool can serve without loading.
+"""
+import os
+import queue
+import threading
+import time
+from io import BytesIO
+from typing import Any, Callable
+
+import anyio
+
+from . import metrics
+from .process_pool import PoolBusyError
+
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+REMBG_SESSIONS = max(1, int(os.getenv("REMBG_SESSIONS", "2")))
+REMBG_PRELOAD = os.getenv("REMBG_PRELOAD", "1").lower() not in ("0", "false", "no")
+# How long a request waits for a free session (or for the initial load) before 503
+REMBG_WAIT_SECS = float(os.getenv("REMBG_WAIT_SECS", "30"))
+# A failed load (missing model file, no network for the download) is retried at most this often
+REMBG_RETRY_SECS = float(os.getenv("REMBG_RETRY_SECS", "60"))
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))  # 0: cores / sessions
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "1"))
+
+
+class ModelSessionPool:
+    """A fixed set of model sessions, created once and lent out one request at a time."""
+
+    def __init__(self, name: str, factory: Callable[[], Any], size: int,
+                 warmup: Callable[[Any], None] | None = None, wait_secs: float = REMBG_WAIT_SECS,
+                 retry_secs: float = REMBG_RETRY_SECS):
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self.warmup = warmup
+        self.wait_secs = wait_secs
+        self.retry_secs = retry_secs
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.state = "idle"  # idle | loading | ready | failed
+        self.error: str | None = None
+        self.load_secs: float | None = None
+        self.in_use = 0
+        self.served = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self) -> None:
+        """Load the sessions on a background thread (no-op if loaded, loading or recently failed)."""
+        with self._lock:
+            if self.state in ("loading", "ready"):
+                return
+            if self.state == "failed" and time.monotonic() - self._failed_at < self.retry_secs:
+                return
+            self.state, self.error = "loading", None
+            self._loaded.clear()
+            self._thread = threading.Thread(target=self._load, name=f"{self.name}-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self) -> None:
+        start = time.time()
+        try:
+            sessions = []
+            for _ in range(self.size):
+                session = self.factory()
+                if self.warmup is not None:
+                    self.warmup(session)
+                sessions.append(session)
+        except Exception as e:
+            print(f"[models] {self.name}: loading failed: {e}")
+            with self._lock:
+                self.state, self.error, self._failed_at = "failed", str(e), time.monotonic()
+            self._loaded.set()
+            return
+        for session in sessions:
+            self._idle.put(session)
+        with self._lock:
+            self.state, self.load_secs = "ready", round(time.time() - start, 3)
+        self._loaded.set()
+        print(f"[models] {self.name}: {self.size} session(s) ready in {self.load_secs}s")
+
+    def _call(self, fn: Callable, args: tuple):
+        deadline = time.monotonic() + self.wait_secs
+        self.start()  # lazy load when preloading is off
+        if not self._loaded.wait(self.wait_secs):
+            raise PoolBusyError(f"{self.name} model (still loading)", retry_after=5)
+        if self.state != "ready":
+            raise RuntimeError(f"{self.name} model unavailable: {self.error}")
+        try:
+            session = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            raise PoolBusyError(self.name)
+        with self._lock:
+            self.in_use += 1
+        try:
+            return fn(session, *args)
+        finally:
+            self._idle.put(session)
+            with self._lock:
+                self.in_use -= 1
+                self.served += 1
+
+    async def run(self, fn: Callable, *args):
+        """fn(session, *args) on a worker thread with a session from the pool.
+
+        Raises PoolBusyError (503) when no session frees up within wait_secs."""
+        return await anyio.to_thread.run_sync(self._call, fn, args)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "sessions": self.size, "in_use": self.in_use, "served": self.served,
+                    "load_secs": self.load_secs, "error": self.error}
+
+
+def _session_options():
+    import onnxruntime as ort  # type: ignore
+
+    opts = ort.SessionOptions()
+    cores = os.cpu_count() or 1
+    opts.intra_op_num_threads = ORT_INTRA_OP_THREADS or max(1, cores // REMBG_SESSIONS)
+    opts.inter_op_num_threads = max(1, ORT_INTER_OP_THREADS)
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return opts
+
+
+def _new_rembg_session():
+    from rembg import new_session  # type: ignore
+
+    return new_session(REMBG_MODEL, sess_opts=_session_options())
+
+
+def _warm_rembg(session) -> None:
+    # One tiny inference: the first run allocates the arena and picks kernels
+    from PIL import Image
+    from rembg import remove  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (64, 64), (127, 127, 127)).save(buf, format="PNG")
+    remove(buf.getvalue(), session=session)
+
+
+rembg_sessions = ModelSessionPool("rembg", _new_rembg_session, REMBG_SESSIONS, warmup=_warm_rembg)
+metrics.register("rembg_sessions", rembg_sessions.stats)
@@ -0,0 +1,191 @@
+"""In-memory near-duplicate index over the 64-bit perceptual hashes in photos.phash.
+
+Multi-index hashing: each hash is split into PHASH_CHUNKS substrings and every
+substring gets its own exact-match table. Two hashes within Hamming distance r
+must agree to within floor(r / chunks) bits on at least one substring
+(pigeonhole), so a lookup probes a handful of buckets per table and only
+popcounts those candidates instead of scanning every photo.
+
+The index is built from the DB on first use and kept current incrementally:
+this process adds/removes photos as it hashes or deletes them, and sync()
+picks up photos hashed by other processes (external job workers, other API
+workers) from the jobs table. Callers verify matches against the DB, so
+entries for photos deleted elsewhere are harmless until the next rebuild.
+"""
+import os
+import threading
+import time
+from itertools import combinations
+
+from sqlalchemy.orm import Session
+
+from ..models.job import Job
+from ..models.photo import Photo
+from . import metrics
+
+PHASH_BITS = 64
+PHASH_RADIUS = int(os.getenv("PHASH_RADIUS", "6"))
+PHASH_CHUNKS = int(os.getenv("PHASH_CHUNKS", "4"))
+PHASH_SYNC_SECS = float(os.getenv("PHASH_SYNC_SECS", "5"))
+
+
+class DuplicatePhotoError(ValueError):
+    """A photo is a near-duplicate of one it may not coexist with."""
+
+    def __init__(self, message: str, photo_id: int | None = None):
+        super().__init__(message)
+        self.photo_id = photo_id
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHamming:
+    """Hamming-radius search over 64-bit ints using per-chunk hash tables.
+
+    Buckets hold distinct hash values (not ids) so a lookup is a tight
+    XOR/popcount loop; ids sharing a value are expanded only for matches.
+    """
+
+    def __init__(self, chunks: int = PHASH_CHUNKS, bits: int = PHASH_BITS):
+        self.chunks = max(1, min(chunks, bits))
+        self.bits = bits
+        # Chunk i covers bits [offsets[i], offsets[i] + widths[i])
+        base, extra = divmod(bits, self.chunks)
+        self.widths = [base + (1 if i < extra else 0) for i in range(self.chunks)]
+        self.offsets = [sum(self.widths[:i]) for i in range(self.chunks)]
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(self.chunks)]
+        self._ids: dict[int, set[int]] = {}  # hash -> ids
+        self._values: dict[int, int] = {}  # id -> hash
+        self._masks: dict[tuple[int, int], list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _chunk(self, value: int, i: int) -> int:
+        return (value >> self.offsets[i]) & ((1 << self.widths[i]) - 1)
+
+    def add(self, item_id: int, value: int) -> None:
+        self.remove(item_id)
+        self._values[item_id] = value
+        ids = self._ids.get(value)
+        if ids is not None:
+            ids.add(item_id)
+            return
+        self._ids[value] = {item_id}
+        for i, table in enumerate(self._tables):
+            table.setdefault(self._chunk(value, i), []).append(value)
+
+    def remove(self, item_id: int) -> None:
+        value = self._values.pop(item_id, None)
+        if value is None:
+            return
+        ids = self._ids[value]
+        ids.discard(item_id)
+        if ids:
+            return
+        del self._ids[value]
+        for i, table in enumerate(self._tables):
+            key = self._chunk(value, i)
+            bucket = table[key]
+            bucket.remove(value)
+            if not bucket:
+                del table[key]
+
+    def _flip_masks(self, width: int, radius: int) -> list[int]:
+        # XOR masks for every chunk value within `radius` bit flips
+        masks = self._masks.get((width, radius))
+        if masks is None:
+            masks = [sum(1 << p for p in positions)
+                     for r in range(radius + 1) for positions in combinations(range(width), r)]
+            self._masks[(width, radius)] = masks
+        return masks
+
+    def search(self, value: int, radius: int) -> list[tuple[int, int]]:
+        """(id, distance) pairs within radius, closest first."""
+        sub_radius = radius // self.chunks
+        hits: dict[int, int] = {}
+        for i, table in enumerate(self._tables):
+            key = self._chunk(value, i)
+            for mask in self._flip_masks(self.widths[i], sub_radius):
+                bucket = table.get(key ^ mask)
+                if not bucket:
+                    continue
+                for candidate in bucket:
+                    d = (candidate ^ value).bit_count()
+                    if d <= radius:
+                        hits[candidate] = d
+        found = [(item_id, d) for candidate, d in hits.items() for item_id in self._ids[candidate]]
+        found.sort(key=lambda x: (x[1], x[0]))
+        return found
+
+
+class PhotoHashIndex:
+    """Process-wide MultiIndexHamming over photo ids, synced from the DB."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = MultiIndexHamming()
+        self._loaded = False
+        self._max_id = 0
+        self._synced_at = 0  # epoch seconds of the last jobs-table sync
+        self.lookups = 0
+
+    def _load(self, db: Session) -> None:
+        start = time.time()
+        rows = db.query(Photo.id, Photo.phash).filter(Photo.phash.isnot(None)).yield_per(10000)
+        index = MultiIndexHamming()
+        max_id = 0
+        for photo_id, phash in rows:
+            index.add(photo_id, int(phash, 16))
+            max_id = max(max_id, photo_id)
+        self._index, self._max_id = index, max_id
+        self._synced_at = int(start)
+        self._loaded = True
+        print(f"[phash] indexed {len(index)} photos in {time.time() - start:.2f}s")
+
+    def sync(self, db: Session, force: bool = False) -> None:
+        """Load on first use, then pull in photos hashed since the last sync."""
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+                return
+            now = time.time()
+            if not force and now - self._synced_at < PHASH_SYNC_SECS:
+                return
+            since, self._synced_at = self._synced_at, int(now)
+            done = db.query(Job.ref).filter(Job.kind == "render_photo", Job.status == "done", Job.updated_at >= since - 1)
+            ids = {int(ref.split(":", 1)[1]) for (ref,) in done if ref and ref.startswith("photo:")}
+            q = db.query(Photo.id, Photo.phash).filter(Photo.phash.isnot(None))
+            rows = q.filter(Photo.id > self._max_id).all()
+            if ids:
+                rows += q.filter(Photo.id.in_(ids)).all()
+            for photo_id, phash in rows:
+                self._index.add(photo_id, int(phash, 16))
+                self._max_id = max(self._max_id, photo_id)
+
+    def add(self, photo_id: int, phash: str) -> None:
+        with self._lock:
+            if self._loaded:
+                self._index.add(photo_id, int(phash, 16))
+
+    def remove(self, photo_id: int) -> None:
+        with self._lock:
+            self._index.remove(photo_id)
+
+    def near(self, db: Session, phash: str, radius: int = PHASH_RADIUS, exclude: int | None = None) -> list[tuple[int, int]]:
+        """(photo_id, distance) of indexed photos within radius of phash, closest first."""
+        self.sync(db)
+        with self._lock:
+            self.lookups += 1
+            found = self._index.search(int(phash, 16), radius)
+        return [(pid, d) for pid, d in found if pid != exclude]
+
+    def stats(self) -> dict:
+        return {"photos": len(self._index), "loaded": self._loaded, "lookups": self.lookups,
+                "radius": PHASH_RADIUS, "chunks": self._index.chunks}
+
+
+phash_index = PhotoHashIndex()
+metrics.register("phash_index", phash_index.stats)
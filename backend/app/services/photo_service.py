@@ -1,152 +1,120 @@
 from typing import List
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import UploadFile
 from ..models.photo import Photo
 from ..models.profile import Profile
 from ..models.user import User
-from ..schemas.photos import PhotoOut, PhotoFilter, PhotoUpdate
+from ..schemas.photos import PhotoOut, PhotoFilter, PhotoUpdate, BatchItemOut, BatchUploadOut
+import asyncio
 import os
-import uuid
-from io import BytesIO
+import json
+from dataclasses import dataclass, field
+from . import image_processing, job_queue
+from .process_pool import image_pool
+from .upload_ingest import ingest_upload, IngestedFile, UploadTooLarge
+from .image_header import read_header, UnrecognizedImage
+from .storage import url_to_path
+from .blob_store import BlobStore, put_bytes, put_file, unlink_quietly
+from .phash_index import phash_index, DuplicatePhotoError
 from .plan_service import (
     normalize_ext,
     get_plan,
     get_upload_rules,
+    get_max_pixels,
     get_storage_quota_bytes,
 )
 
-try:
-    from PIL import Image, ImageDraw, ImageFont
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
+@dataclass
+class PreparedUpload:
+    """Files stored for one upload, ready to be recorded in the DB.
+
+    source_path is set when the derivatives still have to be rendered (by a
+    render_photo job); discard_source means the job owns that file."""
+    digest: str
+    profile: str
+    size: int
+    ext: str = ""
+    processed_url: str | None = None
+    original_url: str | None = None
+    derivatives: dict = field(default_factory=dict)
+    source_path: str | None = None
+    discard_source: bool = False
+
+
+# Fields copied between photos of the same upload (same bytes, same metadata)
+_METADATA_COLUMNS = ("width", "height", "megapixels", "orientation", "image_format", "exif")
+METADATA_BACKFILL_BATCH = int(os.getenv("METADATA_BACKFILL_BATCH", "200"))
+
+
+def _apply_metadata(photo: Photo, meta: dict) -> None:
+    """Store image_processing.image_metadata() output on the photo's columns."""
+    width, height = meta.get("width") or 0, meta.get("height") or 0
+    if not width or not height:
+        return
+    photo.width, photo.height = width, height
+    photo.megapixels = round(width * height / 1_000_000, 2)
+    photo.orientation = "square" if width == height else ("landscape" if width > height else "portrait")
+    photo.image_format = (meta.get("format") or "")[:8] or None
+    photo.exif = json.dumps(meta.get("exif") or {}, sort_keys=True)
+
+
+def _visible():
+    # Photos still rendering (or failed) stay out of public listings; legacy rows have no status
+    return or_(Photo.status == "ready", Photo.status.is_(None))
+
 
 class PhotoService:
     def __init__(self, db: Session):
         self.db = db
 
-    def _apply_watermark(self, raw_bytes: bytes, orig_ext: str) -> tuple[bytes, str]:
-        """Apply a center watermark. Prefer logo (app/assets/watermark.png), fallback to text.
-        Returns (image_bytes, new_ext) where new_ext includes leading dot (e.g. '.jpg' or '.png')."""
-        if not PIL_AVAILABLE:
-            print("[watermark] Pillow not available; install 'pillow'")
-            return raw_bytes, orig_ext or ".jpg"
-        try:
-            with Image.open(BytesIO(raw_bytes)) as im:
-                im = im.convert("RGBA")
-                assets_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
-                logo_path = os.path.join(assets_dir, "watermark.png")
-
-                applied_logo = False
-                if os.path.exists(logo_path):
-                    try:
-                        with Image.open(logo_path).convert("RGBA") as logo:
-                            # Scale logo to ~35% of min(image width,height)
-                            base = min(im.width, im.height)
-                            target_w = max(96, int(base * 0.35))
-                            scale = target_w / logo.width
-                            new_size = (int(logo.width * scale), int(logo.height * scale))
-                            logo = logo.resize(new_size, Image.LANCZOS)
-                            # Opacity 60%
-                            alpha = logo.split()[3]
-                            alpha = alpha.point(lambda a: int(a * 0.6))
-                            logo.putalpha(alpha)
-                            # Center position
-                            x = (im.width - logo.width) // 2
-                            y = (im.height - logo.height) // 2
-                            im.alpha_composite(logo, (x, y))
-                            applied_logo = True
-                            print("[watermark] applied centered logo watermark")
-                    except Exception as e:
-                        print(f"[watermark] logo overlay failed: {e}; using text fallback")
-
-                if not applied_logo:
-                    draw = ImageDraw.Draw(im)
-                    # Text fallback: size ~10% of min dimension
-                    font_size = max(24, int(min(im.width, im.height) * 0.10))
-                    try:
-                        font = ImageFont.truetype("arial.ttf", font_size)
-                    except Exception:
-                        font = ImageFont.load_default()
-                    text = "ClickScapeIndia"
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-                    x = (im.width - text_w) // 2
-                    y = (im.height - text_h) // 2
-                    # Shadow
-                    shadow = max(2, font_size // 20)
-                    draw.text((x + shadow, y + shadow), text, font=font, fill=(0, 0, 0, 160))
-                    draw.text((x, y), text, font=font, fill=(255, 255, 255, 210))
-                    print("[watermark] applied centered text watermark")
-
-                # Encode result
-                buf = BytesIO()
-                save_ext = (orig_ext or ".jpg").lower()
-                if save_ext in (".png", ".webp"):
-                    fmt = "PNG"; new_ext = ".png"
-                else:
-                    fmt = "JPEG"; new_ext = ".jpg"
-                if im.mode != "RGB":
-                    im = im.convert("RGB")
-                im.save(buf, format=fmt, quality=92)
-                return buf.getvalue(), new_ext
-        except Exception as e:
-            print(f"[watermark] failed overall: {e}; using original image")
-        return raw_bytes, (orig_ext or ".jpg")
-
-    def _compress_for_free(self, raw_bytes: bytes, orig_ext: str) -> tuple[bytes, str]:
-        """Produce a web-optimized image for free-tier export (medium quality)."""
-        if not PIL_AVAILABLE:
-            return raw_bytes, orig_ext or ".jpg"
-        try:
-            with Image.open(BytesIO(raw_bytes)) as im:
-                if im.mode not in ("RGB", "L"):
-                    im = im.convert("RGB")
-                # Limit longest side to ~1600px for web
-                max_side = 1600
-                ratio = min(max_side / im.width, max_side / im.height, 1.0)
-                if ratio < 1.0:
-                    new_size = (int(im.width * ratio), int(im.height * ratio))
-                    im = im.resize(new_size, Image.LANCZOS)
-                buf = BytesIO()
-                ext = (orig_ext or ".jpg").lower()
-                if ext in (".png", ".webp"):
-                    fmt = "PNG"; new_ext = ".png"
-                else:
-                    fmt = "JPEG"; new_ext = ".jpg"
-                im.save(buf, format=fmt, quality=82, optimize=True)
-                return buf.getvalue(), new_ext
-        except Exception as e:
-            print(f"[compress] failed: {e}; returning original")
-        return raw_bytes, (orig_ext or ".jpg")
-
-    def _save_bytes(self, data: bytes, ext: str) -> tuple[str, str]:
-        """Saves bytes to uploads dir with random filename and returns (disk_path, public_url)."""
-        base_dir = os.path.dirname(os.path.dirname(__file__))  # .../app
-        upload_dir = os.path.join(base_dir, "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-        ext = (ext or ".jpg").lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        file_path = os.path.join(upload_dir, filename)
-        with open(file_path, "wb") as f:
-            f.write(data)
-        url = f"/uploads/{filename}"
-        return file_path, url
+    def _save_derivatives(self, rendered: dict, orig_ext: str) -> tuple[dict, str | None, int]:
+        """Write rendered derivatives to the blob store.
+        Returns (derivatives map, processed_url, bytes written)."""
+        derivatives = {}
+        total = 0
+        for name, entry in rendered.items():
+            item = {"width": entry["width"], "height": entry["height"]}
+            for fmt, data in entry["files"].items():
+                item[fmt] = put_bytes(data, image_processing.FORMAT_EXT[fmt])
+                total += len(data)
+            derivatives[name] = item
+        full = derivatives.get("full") or {}
+        return derivatives, full.get(image_processing.primary_format(orig_ext)), total
 
-    async def upload_photo(self, title: str, category: str, tags: str, price: float, watermark: bool, image: UploadFile, user: User | None, for_sale: bool = False, is_public: bool = True) -> PhotoOut:
-        # Validate by plan
-        plan = get_plan(user)
-        allowed_exts, max_bytes, _upload_limit = get_upload_rules(plan)
-        ext = normalize_ext(image.filename)
+    def _check_ext(self, plan: str, filename: str | None) -> str:
+        allowed_exts, _max_bytes, _upload_limit = get_upload_rules(plan)
+        ext = normalize_ext(filename)
         if ext not in allowed_exts:
             raise ValueError(f"Unsupported file type for {plan} plan. Allowed: {', '.join(sorted(allowed_exts))}")
-        contents = await image.read()
-        orig_size = len(contents or b"")
-        if orig_size > max_bytes:
-            raise ValueError(f"File too large for {plan} plan. Max {max_bytes // (1024*1024)} MB")
+        return ext
 
+    async def _preflight(self, image: UploadFile, plan: str, ext: str) -> str:
+        """Check the real format and pixel count from the file header, before it is
+        copied or decoded. Returns the extension to store the file under."""
+        allowed_exts, _max_bytes, _upload_limit = get_upload_rules(plan)
+        try:
+            # A few small reads of the spooled upload; no thread hop when it's in memory
+            if getattr(image, "_in_memory", True):
+                header = read_header(image.file)
+            else:
+                header = await asyncio.to_thread(read_header, image.file)
+        except UnrecognizedImage as e:
+            raise ValueError(f"Could not read image file: {e}")
+        finally:
+            image.file.seek(0)
+        real_ext = header.ext_for(ext)
+        if real_ext not in allowed_exts:
+            raise ValueError(f"Unsupported file type for {plan} plan. Allowed: {', '.join(sorted(allowed_exts))}")
+        max_pixels = get_max_pixels(plan)
+        if header.pixels > max_pixels:
+            raise ValueError(f"Image too large for {plan} plan: {header.width}x{header.height}. "
+                             f"Max {max_pixels / 1_000_000:g} megapixels")
+        return real_ext
+
+    def _check_price(self, price: float | None) -> float:
         # Enforce marketplace pricing constraints
-        import os
         try:
             min_price = float(os.getenv("PRICE_MIN", "50"))
             max_price = float(os.getenv("PRICE_MAX", "50000"))
@@ -156,60 +124,283 @@ class PhotoService:
             price = 0.0
         if price < min_price or price > max_price:
             raise ValueError(f"Price must be between ₹{int(min_price)} and ₹{int(max_price)}")
+        return price
 
+    def _check_quota(self, plan: str, user: User | None, incoming: int) -> None:
+        if plan != "premium":
+            return
         # Premium: enforce storage quota (persistent)
-        original_url = None
-        processed_url = None
-        if plan == "premium":
-            quota = get_storage_quota_bytes(plan)
-            used = getattr(user, "storage_used", 0) or 0
-            if used + orig_size > quota:
-                raise ValueError("Storage quota exceeded. Please delete files or upgrade your plan.")
-            # Save original as-is
-            _, original_url = self._save_bytes(contents, ext)
-            # Processed for previews can be a lightly compressed copy without watermark
-            preview_bytes, preview_ext = self._compress_for_free(contents, ext)
-            _, processed_url = self._save_bytes(preview_bytes, preview_ext)
-        else:
-            # Free: always watermark and web-optimize
-            wm_bytes, wm_ext = self._apply_watermark(contents, ext)
-            out_bytes, out_ext = self._compress_for_free(wm_bytes, wm_ext)
-            _, processed_url = self._save_bytes(out_bytes, out_ext)
+        quota = get_storage_quota_bytes(plan)
+        used = getattr(user, "storage_used", 0) or 0
+        if used + incoming > quota:
+            raise ValueError("Storage quota exceeded. Please delete files or upgrade your plan.")
+
+    async def _ingest(self, image: UploadFile, plan: str, ext: str) -> IngestedFile:
+        # Stream to a temp file; aborts as soon as the plan's size limit is passed
+        _exts, max_bytes, _limit = get_upload_rules(plan)
+        try:
+            return await ingest_upload(image, max_bytes, ext)
+        except UploadTooLarge:
+            raise ValueError(f"File too large for {plan} plan. Max {max_bytes // (1024*1024)} MB")
+
+    def _prepare(self, upload: IngestedFile, plan: str, ext: str) -> PreparedUpload:
+        """Store the original and resolve what is already rendered (no DB writes).
+
+        Content-addressed dedup: a hit reuses the rendered blob for the profile.
+        On a miss only the image header is checked here and rendering is left to
+        a render_photo job, so the request costs a file rename, not a decode.
+        Consumes the temp file unless it becomes the job's source."""
+        profile = "premium" if plan == "premium" else "free"
+        blobs = BlobStore(self.db)
+        prepared = PreparedUpload(digest=upload.sha256, profile=profile, size=upload.size, ext=ext)
+        keep_temp = False
+        try:
+            existing = blobs.get(upload.sha256, profile)
+            if existing is not None:
+                prepared.processed_url = existing.url
+                prepared.derivatives = json.loads(existing.derivatives) if existing.derivatives else {}
+            else:
+                try:
+                    image_processing.probe(upload.path)
+                except Exception as e:
+                    print(f"[upload] unreadable image: {e}")
+                    raise ValueError("Could not read image file")
+            if plan == "premium":
+                existing_original = blobs.get(upload.sha256, "original")
+                # Save original as-is (rename of the temp file, no copy) unless already stored
+                prepared.original_url = existing_original.url if existing_original else put_file(upload.path, upload.sha256, ext)
+            if existing is None:
+                if prepared.original_url:
+                    prepared.source_path = url_to_path(prepared.original_url)
+                else:
+                    # Free uploads keep no original: the job renders from the temp file, then deletes it
+                    prepared.source_path, prepared.discard_source, keep_temp = upload.path, True, True
+        finally:
+            if not keep_temp:
+                upload.discard()
+        return prepared
 
+    def _commit_uploads(self, items: list[tuple[PreparedUpload, dict]], plan: str, user: User | None) -> tuple[list[Photo], list[int]]:
+        """Insert all photos, their blob references, render jobs and the storage_used
+        update in one transaction.
+
+        items: (prepared files, Photo column values) pairs. Returns (photos, job ids)."""
         # Royalty percent (can be overridden per env)
         try:
             royalty_percent = float(os.getenv("ROYALTY_PERCENT", "0.30"))
         except Exception:
             royalty_percent = 0.30
 
-        photo = Photo(
-            title=title,
-            category=category,
-            tags=tags or "",
-            price=price or 0.0,
-            royalty_percent=royalty_percent,
-            watermark=(plan == "free"),
-            url=processed_url,
-            processed_url=processed_url,
-            original_url=original_url,
-            bytes_size=(orig_size if plan == "premium" else 0),
-            for_sale=bool(for_sale),
-            is_public=bool(is_public),
-            # Associate uploads with the current user for competition constraints and ownership
-            # (was previously limited to premium only)
-            user_id=(user.id if user else None),
-        )
-        self.db.add(photo)
-        # Update storage usage for premium
-        if plan == "premium":
-            user.storage_used = (getattr(user, "storage_used", 0) or 0) + orig_size
-            self.db.add(user)
-        self.db.commit()
+        # A concurrent upload of the same bytes may register a blob first; retry once as a dedup hit
+        for attempt in range(2):
+            blobs = BlobStore(self.db)
+            photos = []
+            for prepared, fields in items:
+                pending = prepared.source_path is not None
+                # A pending photo takes its rendered-blob reference when the job finishes
+                if not pending and not blobs.acquire(prepared.digest, prepared.profile):
+                    blobs.register(prepared.digest, prepared.profile, prepared.processed_url, prepared.derivatives)
+                if prepared.original_url and not blobs.acquire(prepared.digest, "original"):
+                    blobs.register(prepared.digest, "original", prepared.original_url, size=prepared.size)
+                photos.append(Photo(
+                    **fields,
+                    royalty_percent=royalty_percent,
+                    watermark=(plan == "free"),
+                    url=prepared.processed_url,
+                    processed_url=prepared.processed_url,
+                    original_url=prepared.original_url,
+                    derivatives=json.dumps(prepared.derivatives) if prepared.derivatives else "",
+                    content_hash=prepared.digest,
+                    status=("processing" if pending else "ready"),
+                    # Quota is per user: every upload counts, even when its bytes were deduplicated
+                    bytes_size=(prepared.size if plan == "premium" else 0),
+                    # Associate uploads with the current user for competition constraints and ownership
+                    # (was previously limited to premium only)
+                    user_id=(user.id if user else None),
+                ))
+            for (prepared, _fields), photo in zip(items, photos):
+                if prepared.source_path is None:
+                    # Same bytes as an earlier photo: reuse its perceptual hash and metadata
+                    photo.phash = self._sibling_phash(prepared.digest)
+                    self._copy_sibling_metadata(photo, prepared.digest)
+            self.db.add_all(photos)
+            # Update storage usage for premium
+            if plan == "premium":
+                user.storage_used = (getattr(user, "storage_used", 0) or 0) + sum(p.size for p, _ in items)
+                self.db.add(user)
+            try:
+                self.db.flush()  # assigns photo ids for the job payloads
+                for photo in photos:
+                    self._link_duplicate(photo)
+                jobs = []
+                for (prepared, _fields), photo in zip(items, photos):
+                    if prepared.source_path is None:
+                        continue
+                    jobs.append(job_queue.enqueue(self.db, "render_photo", {
+                        "photo_id": photo.id,
+                        "digest": prepared.digest,
+                        "profile": prepared.profile,
+                        "source": prepared.source_path,
+                        "ext": prepared.ext,
+                        "discard_source": prepared.discard_source,
+                    }, ref=f"photo:{photo.id}"))
+                self.db.commit()
+                for photo in photos:
+                    if photo.phash:
+                        phash_index.add(photo.id, photo.phash)
+                return photos, [j.id for j in jobs]
+            except IntegrityError:
+                self.db.rollback()
+                if attempt:
+                    raise
+        return [], []
+
+    async def upload_photo(self, title: str, category: str, tags: str, price: float, watermark: bool, image: UploadFile, user: User | None, for_sale: bool = False, is_public: bool = True) -> PhotoOut:
+        # Validate by plan
+        plan = get_plan(user)
+        ext = self._check_ext(plan, image.filename)
+        price = self._check_price(price)
+        ext = await self._preflight(image, plan, ext)
+        upload = await self._ingest(image, plan, ext)
+        try:
+            self._check_quota(plan, user, upload.size)
+        except ValueError:
+            upload.discard()
+            raise
+        prepared = self._prepare(upload, plan, ext)
+        fields = dict(title=title, category=category, tags=tags or "", price=price or 0.0,
+                      for_sale=bool(for_sale), is_public=bool(is_public))
+        (photo,), job_ids = self._commit_uploads([(prepared, fields)], plan, user)
+        # Returns right away with status "processing" unless the queue runs jobs inline
+        await job_queue.dispatch(job_ids)
         self.db.refresh(photo)
         return PhotoOut.from_orm(photo)
 
+    async def upload_batch(self, title: str, category: str, tags: str, price: float, images: List[UploadFile], user: User | None) -> BatchUploadOut:
+        """Upload many images: validate and store all, commit once, render in the background.
+
+        Per-item problems (type, size, unreadable image) are reported in the
+        result instead of aborting the batch; request-level problems (price,
+        quota for the whole batch) raise ValueError before any work is done."""
+        plan = get_plan(user)
+        price = self._check_price(price)
+        results: list[BatchItemOut] = [BatchItemOut(filename=img.filename or "") for img in images]
+        exts: dict[int, str] = {}
+        for i, img in enumerate(images):
+            try:
+                exts[i] = self._check_ext(plan, img.filename)
+            except ValueError as e:
+                results[i].error = str(e)
+
+        async def ingest(i: int):
+            try:
+                exts[i] = await self._preflight(images[i], plan, exts[i])
+                return i, await self._ingest(images[i], plan, exts[i])
+            except ValueError as e:
+                results[i].error = str(e)
+                return i, None
+
+        ingested = [(i, up) for i, up in await asyncio.gather(*(ingest(i) for i in exts)) if up is not None]
+        try:
+            self._check_quota(plan, user, sum(up.size for _, up in ingested))
+        except ValueError:
+            for _, up in ingested:
+                up.discard()
+            raise
+
+        processed = []
+        for i, up in ingested:
+            try:
+                processed.append((i, self._prepare(up, plan, exts[i])))
+            except ValueError as e:
+                results[i].error = str(e)
+        items = []
+        for i, prepared in processed:
+            fields = dict(title=title or (images[i].filename or "Untitled"), category=category, tags=tags or "",
+                          price=price or 0.0, for_sale=False, is_public=True)
+            items.append((prepared, fields))
+        photos, job_ids = self._commit_uploads(items, plan, user) if items else ([], [])
+        await job_queue.dispatch(job_ids)
+        for (i, _prepared), photo in zip(processed, photos):
+            self.db.refresh(photo)
+            results[i].photo = PhotoOut.from_orm(photo)
+        uploaded = sum(1 for r in results if r.photo is not None)
+        return BatchUploadOut(uploaded=uploaded, failed=len(results) - uploaded, items=results)
+
+    def _sibling_phash(self, digest: str) -> str | None:
+        row = self.db.query(Photo.phash).filter(Photo.content_hash == digest, Photo.phash.isnot(None)).first()
+        return row[0] if row else None
+
+    def _copy_sibling_metadata(self, photo: Photo, digest: str) -> bool:
+        sibling = self.db.query(Photo).filter(Photo.content_hash == digest, Photo.width.isnot(None)).first()
+        if sibling is None:
+            return False
+        for name in _METADATA_COLUMNS:
+            setattr(photo, name, getattr(sibling, name))
+        return True
+
+    def _link_duplicate(self, photo: Photo) -> None:
+        """Point duplicate_of at the earliest other photo that looks the same."""
+        if not photo.phash or photo.id is None:
+            return
+        earlier = [pid for pid, _d in phash_index.near(self.db, photo.phash, exclude=photo.id) if pid < photo.id]
+        photo.duplicate_of = min(earlier) if earlier else None
+
+    async def ensure_phash(self, photo: Photo) -> str | None:
+        """Perceptual hash of a photo, computing it from the stored image for older rows."""
+        if photo.phash:
+            return photo.phash
+        if photo.status not in (None, "ready"):
+            return None
+        path = url_to_path(photo.processed_url or photo.url or "")
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            photo.phash = await image_pool.run(image_processing.dhash, path)
+        except Exception as e:
+            print(f"[phash] could not hash photo {photo.id}: {e}")
+            return None
+        self._link_duplicate(photo)
+        self.db.commit()
+        phash_index.add(photo.id, photo.phash)
+        return photo.phash
+
+    def near_duplicates(self, photo: Photo, radius: int | None = None) -> list[tuple[Photo, int]]:
+        """Existing photos that look like this one, closest first: (photo, hamming distance)."""
+        if not photo.phash:
+            return []
+        kwargs = {"radius": radius} if radius is not None else {}
+        matches = phash_index.near(self.db, photo.phash, exclude=photo.id, **kwargs)
+        if not matches:
+            return []
+        rows = {p.id: p for p in self.db.query(Photo).filter(Photo.id.in_([pid for pid, _ in matches])).all()}
+        stale = [pid for pid, _ in matches if pid not in rows]
+        for pid in stale:
+            # Deleted by another process since it was indexed
+            phash_index.remove(pid)
+        return [(rows[pid], d) for pid, d in matches if pid in rows]
+
+    def check_competition_entry(self, photo: Photo) -> None:
+        """Refuse a competition entry that repeats an existing entry (any category)."""
+        for other, _d in self.near_duplicates(photo):
+            if other.competition_entry:
+                where = f" in '{other.category}'" if other.category else ""
+                raise DuplicatePhotoError(f"This photo was already submitted{where} (entry #{other.id})", other.id)
+
+    def get_status(self, photo: Photo) -> dict:
+        """Processing state of a photo and its latest render job."""
+        job = job_queue.latest_for(self.db, f"photo:{photo.id}")
+        return {
+            "id": photo.id,
+            "status": photo.status or "ready",
+            "attempts": job.attempts if job else 0,
+            "max_attempts": job.max_attempts if job else 0,
+            "retry_at": job.run_after if job and job.status == "queued" and job.attempts else None,
+            "error": (job.last_error or None) if job else None,
+        }
+
     def list_marketplace(self, page: int, size: int) -> List[PhotoOut]:
-        q = self.db.query(Photo).filter(Photo.for_sale == True, Photo.is_public == True)  # noqa: E712
+        q = self.db.query(Photo).filter(Photo.for_sale == True, Photo.is_public == True, _visible())  # noqa: E712
         items = q.order_by(Photo.id.desc()).offset((page - 1) * size).limit(size).all()
         results: List[PhotoOut] = []
         user_ids = {x.user_id for x in items if x.user_id}
@@ -236,6 +427,10 @@ class PhotoService:
             raise ValueError("Photo not found")
         if photo.user_id and photo.user_id != user.id:
             raise PermissionError("Not allowed")
+        # Reposts: another user's photo that looks the same cannot be sold again
+        for other, _d in self.near_duplicates(photo):
+            if other.user_id != photo.user_id and other.for_sale:
+                raise DuplicatePhotoError("This photo matches an item already listed in the marketplace", other.id)
         photo.for_sale = True
         photo.is_public = True
         self.db.commit()
@@ -265,9 +460,17 @@ class PhotoService:
         return photo.processed_url or photo.url or ""
 
     def list_photos(self, page: int, size: int, filters: PhotoFilter) -> List[PhotoOut]:
-        q = self.db.query(Photo)
+        q = self.db.query(Photo).filter(_visible())
         if filters.category:
             q = q.filter(Photo.category == filters.category)
+        if filters.orientation:
+            q = q.filter(Photo.orientation == filters.orientation)
+        if filters.min_megapixels is not None:
+            q = q.filter(Photo.megapixels >= filters.min_megapixels)
+        if filters.max_megapixels is not None:
+            q = q.filter(Photo.megapixels <= filters.max_megapixels)
+        if filters.image_format:
+            q = q.filter(Photo.image_format == filters.image_format.lower())
         items = q.order_by(Photo.id.desc()).offset((page - 1) * size).limit(size).all()
         results: List[PhotoOut] = []
         # preload profiles for efficiency
@@ -306,6 +509,23 @@ class PhotoService:
             results.append(base)
         return results
 
+    def derivative_file(self, photo: Photo, size: str, accept: str) -> tuple[str, str] | None:
+        """Resolve the best stored rendition of a photo for an Accept header.
+        Returns (disk_path, format) or None when the photo has no such size."""
+        try:
+            derivatives = json.loads(photo.derivatives) if photo.derivatives else {}
+        except ValueError:
+            derivatives = {}
+        entry = derivatives.get(size)
+        if not entry:
+            return None
+        available = [k for k in entry if k not in ("width", "height")]
+        fmt = image_processing.negotiate_format(accept, available)
+        path = url_to_path(entry.get(fmt) or "")
+        if not path or not os.path.isfile(path):
+            return None
+        return path, fmt
+
     def get_photo(self, photo_id: int) -> Photo | None:
         return self.db.query(Photo).filter(Photo.id == photo_id).first()
 
@@ -332,5 +552,116 @@ class PhotoService:
                     self.db.add(user)
                 except Exception:
                     pass
+        # Release the shared files; they are removed once no photo references them
+        orphaned = []
+        if photo.content_hash:
+            blobs = BlobStore(self.db)
+            # Photos that never finished rendering hold no rendered-blob reference
+            if photo.status in (None, "ready"):
+                orphaned += blobs.release(photo.content_hash, "free" if photo.watermark else "premium")
+            if photo.original_url:
+                orphaned += blobs.release(photo.content_hash, "original")
         self.db.delete(photo)
         self.db.commit()
+        phash_index.remove(photo_id)
+        unlink_quietly(orphaned)
+
+
+def _drop_source(payload: dict) -> None:
+    if payload.get("discard_source"):
+        unlink_quietly([payload["source"]])
+
+
+async def _render_photo_job(db: Session, payload: dict) -> None:
+    """render_photo job: render (or reuse) the derivatives of an uploaded photo and mark it ready."""
+    photo = db.get(Photo, payload["photo_id"])
+    if photo is None or photo.status == "ready":
+        # Deleted while queued, or a duplicate run
+        _drop_source(payload)
+        return
+    digest, profile, ext = payload["digest"], payload["profile"], payload["ext"]
+    blobs = BlobStore(db)
+    blob = blobs.acquire(digest, profile)
+    service = PhotoService(db)
+    if blob is not None:
+        derivatives = json.loads(blob.derivatives) if blob.derivatives else {}
+        processed_url = blob.url
+        if not service._copy_sibling_metadata(photo, digest):
+            try:
+                _apply_metadata(photo, await image_pool.run(image_processing.image_metadata, payload["source"]))
+            except Exception as e:
+                print(f"[metadata] could not read photo {photo.id}: {e}")
+    else:
+        # Free: watermark every rendition; premium previews stay clean. Metadata comes from the same open.
+        rendered, meta = await image_pool.run(image_processing.render_upload, payload["source"], ext, profile == "free")
+        derivatives, processed_url, size = service._save_derivatives(rendered, ext)
+        blobs.register(digest, profile, processed_url, derivatives, size)
+        _apply_metadata(photo, meta)
+    photo.url = processed_url
+    photo.processed_url = processed_url
+    photo.derivatives = json.dumps(derivatives) if derivatives else ""
+    photo.status = "ready"
+    # Hash the unwatermarked source so free and premium copies of a frame match
+    photo.phash = service._sibling_phash(digest)
+    if not photo.phash:
+        try:
+            photo.phash = await image_pool.run(image_processing.dhash, payload["source"])
+        except Exception as e:
+            print(f"[phash] could not hash photo {photo.id}: {e}")
+    service._link_duplicate(photo)
+    # A concurrent job registering the same blob raises IntegrityError here; the retry is a dedup hit
+    db.commit()
+    if photo.phash:
+        phash_index.add(photo.id, photo.phash)
+    _drop_source(payload)
+
+
+def _render_photo_dead(db: Session, payload: dict, error: str) -> None:
+    photo = db.get(Photo, payload["photo_id"])
+    if photo is not None and photo.status != "ready":
+        photo.status = "failed"
+        db.commit()
+    _drop_source(payload)
+
+
+async def _backfill_metadata_job(db: Session, payload: dict) -> None:
+    """backfill_metadata job: fill the metadata columns of one batch of older photos,
+    then enqueue the next batch. Reads the original where one is kept, else the
+    largest rendition (free uploads keep no original, so no EXIF for those)."""
+    after_id = int(payload.get("after_id", 0))
+    batch = int(payload.get("batch", METADATA_BACKFILL_BATCH))
+    photos = (db.query(Photo)
+              .filter(Photo.id > after_id, Photo.width.is_(None), _visible())
+              .order_by(Photo.id).limit(batch).all())
+    service = PhotoService(db)
+    for photo in photos:
+        if photo.content_hash and service._copy_sibling_metadata(photo, photo.content_hash):
+            continue
+        path = url_to_path(photo.original_url or "") or url_to_path(photo.processed_url or photo.url or "")
+        if not path or not os.path.isfile(path):
+            continue
+        try:
+            _apply_metadata(photo, await image_pool.run(image_processing.image_metadata, path))
+        except Exception as e:
+            print(f"[metadata] could not read photo {photo.id}: {e}")
+        # Keep sibling lookups within this batch working
+        db.flush()
+    if len(photos) == batch:
+        job_queue.enqueue(db, "backfill_metadata", {"after_id": photos[-1].id, "batch": batch},
+                          ref="backfill_metadata")
+    db.commit()
+    print(f"[metadata] backfilled photos {after_id + 1}..{photos[-1].id if photos else after_id}")
+
+
+def enqueue_metadata_backfill(db: Session, batch: int = METADATA_BACKFILL_BATCH) -> int | None:
+    """Start the metadata backfill unless a run is already queued. Returns the job id."""
+    latest = job_queue.latest_for(db, "backfill_metadata")
+    if latest is not None and latest.status in ("queued", "running"):
+        return None
+    job = job_queue.enqueue(db, "backfill_metadata", {"after_id": 0, "batch": batch}, ref="backfill_metadata")
+    db.commit()
+    return job.id
+
+
+job_queue.register("render_photo", _render_photo_job, on_dead=_render_photo_dead)
+job_queue.register("backfill_metadata", _backfill_metadata_job)
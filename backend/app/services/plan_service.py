@@ -3,6 +3,9 @@ from typing import Set, Tuple
 
 FREE_MAX_BYTES = int(os.getenv("FREE_MAX_UPLOAD_MB", "3")) * 1024 * 1024
 PREMIUM_MAX_BYTES = int(os.getenv("PREMIUM_MAX_UPLOAD_MB", "25")) * 1024 * 1024
+# Decoded size limits (megapixels), checked from the header before any decode
+FREE_MAX_MEGAPIXELS = float(os.getenv("FREE_MAX_MEGAPIXELS", "40"))
+PREMIUM_MAX_MEGAPIXELS = float(os.getenv("PREMIUM_MAX_MEGAPIXELS", "150"))
 PREMIUM_STORAGE_QUOTA_MB = int(os.getenv("PREMIUM_STORAGE_QUOTA_MB", "10240"))  # 10 GB default
 
 FREE_ALLOWED_EXTS: Set[str] = {".jpg", ".jpeg", ".png"}
@@ -30,6 +33,11 @@ def get_upload_rules(plan: str) -> Tuple[Set[str], int, int]:
     return FREE_ALLOWED_EXTS, FREE_MAX_BYTES, FREE_UPLOAD_LIMIT
 
 
+def get_max_pixels(plan: str) -> int:
+    megapixels = PREMIUM_MAX_MEGAPIXELS if plan == "premium" else FREE_MAX_MEGAPIXELS
+    return int(megapixels * 1_000_000)
+
+
 def get_storage_quota_bytes(plan: str) -> int:
     if plan == "premium":
         return PREMIUM_STORAGE_QUOTA_MB * 1024 * 1024
@@ -39,12 +47,14 @@ def get_storage_quota_bytes(plan: str) -> int:
 
 def get_entitlements(plan: str) -> dict:
     allowed_exts, max_bytes, upload_limit = get_upload_rules(plan)
+    max_megapixels = get_max_pixels(plan) // 1_000_000
     formats = sorted({e.lstrip('.') for e in allowed_exts})
     if plan == "premium":
         return {
             "plan": "premium",
             "upload_limit": upload_limit,
             "max_file_mb": max_bytes // (1024 * 1024),
+            "max_megapixels": max_megapixels,
             "formats": formats,
             "basic_edits": True,
             "filters_basic": True,
@@ -63,6 +73,7 @@ def get_entitlements(plan: str) -> dict:
             "plan": "free",
             "upload_limit": upload_limit,
             "max_file_mb": max_bytes // (1024 * 1024),
+            "max_megapixels": max_megapixels,
             "formats": formats,
             "basic_edits": True,
             "filters_basic": True,  # limited client-side list
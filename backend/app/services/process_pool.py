@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import metrics
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when a pool already has max_pending jobs queued or running."""
+
+    def __init__(self, name: str, retry_after: int = 2):
+        super().__init__(f"{name} workers are busy, please retry shortly")
+        self.retry_after = retry_after
+
+
+class BoundedProcessPool:
+    """A lazily started process pool with a cap on queued work.
+
+    CPU-heavy work (Pillow decode/encode, model inference) is handed to worker
+    processes so the event loop keeps serving other requests. Submissions beyond
+    max_pending are rejected with PoolBusyError instead of queuing unboundedly.
+    workers=0 runs jobs on a thread instead (useful for dev and tests).
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int, start_method: str = "spawn"):
+        self.name = name
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.start_method = start_method
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _ensure(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers == 0:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+                else:
+                    ctx = multiprocessing.get_context(self.start_method)
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool and await its result.
+
+        fn and args must be picklable (module-level functions, plain data)."""
+        executor = self._ensure()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PoolBusyError(self.name)
+            self._pending += 1
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, fn, *args)
+            ok = True
+            return result
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault in a codec): start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            slots = self.workers or 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._pending,
+                "queue_depth": max(0, self._pending - slots),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", str(os.cpu_count() or 2)))
+IMAGE_POOL_MAX_PENDING = int(os.getenv("IMAGE_POOL_MAX_PENDING", str(max(1, IMAGE_POOL_WORKERS) * 4)))
+
+image_pool = BoundedProcessPool(
+    "image",
+    workers=IMAGE_POOL_WORKERS,
+    max_pending=IMAGE_POOL_MAX_PENDING,
+    start_method=os.getenv("IMAGE_POOL_START_METHOD", "spawn"),
+)
+
+metrics.register("image_pool", image_pool.stats)
@@ -0,0 +1,86 @@
+"""Where upload files live on disk and how their public URLs map to paths.
+
+Files are sharded two levels deep by a hex prefix of their name:
+uploads/ab/cd/abcd1234....jpg (see relpath_for). Content-addressed names use
+their digest; prefixed names (ai_<digest>.png, avatar_<id>_<uuid>.jpg) use the
+trailing hex token. Older flat URLs (/uploads/<name>) still resolve: lookups
+try both layouts, so files can be moved by `python -m app.migrate_uploads`
+while the app is running.
+"""
+import hashlib
+import os
+import re
+
+APP_DIR = os.path.dirname(os.path.dirname(__file__))  # .../app
+UPLOAD_DIR = os.path.join(APP_DIR, "uploads")
+URL_PREFIX = "/uploads/"
+
+_HEX = re.compile(r"^[0-9a-f]{4,}$")
+_SHARD = re.compile(r"^[0-9a-f]{2}$")
+
+
+def _valid_name(name: str) -> bool:
+    return bool(name) and "/" not in name and "\\" not in name and not name.startswith(".")
+
+
+def _shard_key(filename: str) -> str:
+    token = os.path.splitext(filename)[0].rsplit("_", 1)[-1].lower()
+    if _HEX.match(token):
+        return token[:4]
+    return hashlib.sha256(filename.encode()).hexdigest()[:4]
+
+
+def relpath_for(filename: str) -> str:
+    """Sharded location of a file relative to UPLOAD_DIR, e.g. "ab/cd/abcd...jpg"."""
+    key = _shard_key(filename)
+    return f"{key[:2]}/{key[2:4]}/{filename}"
+
+
+def path_for(filename: str) -> str:
+    """Absolute sharded path for a new upload file (its directory is created)."""
+    path = os.path.join(UPLOAD_DIR, *relpath_for(filename).split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def url_for(filename: str) -> str:
+    return URL_PREFIX + relpath_for(filename)
+
+
+def split_url(url: str) -> str | None:
+    """Filename of an /uploads URL in either layout, or None if it isn't a valid upload URL."""
+    if not url or not url.startswith(URL_PREFIX):
+        return None
+    parts = url[len(URL_PREFIX):].split("/")
+    name = parts[-1]
+    if not _valid_name(name):
+        return None
+    if len(parts) == 1:
+        return name
+    if len(parts) == 3 and _SHARD.match(parts[0]) and _SHARD.match(parts[1]) \
+            and relpath_for(name) == "/".join(parts):
+        return name
+    return None
+
+
+def canonical_url(url: str) -> str:
+    """The sharded form of an upload URL; anything else is returned unchanged."""
+    name = split_url(url)
+    return url_for(name) if name else url
+
+
+def url_to_path(url: str) -> str | None:
+    """Map a public /uploads URL to its file on disk (None if not an upload URL).
+
+    Either layout resolves to whichever copy exists, preferring the sharded one,
+    so URLs stay valid before, during and after the migration."""
+    name = split_url(url)
+    if name is None:
+        return None
+    sharded = os.path.join(UPLOAD_DIR, *relpath_for(name).split("/"))
+    if os.path.exists(sharded):
+        return sharded
+    flat = os.path.join(UPLOAD_DIR, name)
+    if os.path.exists(flat):
+        return flat
+    return sharded
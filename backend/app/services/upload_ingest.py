@@ -0,0 +1,84 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+
+import aiofiles
+from fastapi import UploadFile
+
+from .storage import UPLOAD_DIR, path_for, url_for
+
+# Temp files live next to the uploads so persisting them is a same-filesystem rename
+INGEST_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", os.path.join(UPLOAD_DIR, ".incoming"))
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_KB", "256")) * 1024
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large. Max {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class IngestedFile:
+    """An upload copied to a private temp file, with its size and SHA-256."""
+    path: str
+    size: int
+    sha256: str
+    ext: str
+
+    def persist(self, prefix: str = "", ext: str | None = None) -> tuple[str, str]:
+        """Move the temp file into the uploads dir. Returns (disk_path, public_url)."""
+        filename = f"{prefix}{uuid.uuid4().hex}{(ext or self.ext or '.jpg').lower()}"
+        dest = path_for(filename)
+        os.replace(self.path, dest)
+        self.path = dest
+        return dest, url_for(filename)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def discard(self) -> None:
+        if os.path.dirname(self.path) != os.path.abspath(INGEST_TMP_DIR):
+            return  # already persisted
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+async def ingest_upload(upload: UploadFile, max_bytes: int, ext: str = "") -> IngestedFile:
+    """Stream an UploadFile to a temp file in CHUNK_SIZE pieces.
+
+    Hashes and counts as it goes and raises UploadTooLarge as soon as the
+    running size passes max_bytes, so oversized files are never fully read and
+    the pipeline gets a path instead of a bytes object.
+    """
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    os.makedirs(INGEST_TMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=INGEST_TMP_DIR, suffix=(ext or "").lower())
+    os.close(fd)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return IngestedFile(path=os.path.abspath(path), size=size, sha256=digest.hexdigest(), ext=(ext or "").lower())
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageFont
+    PIL_AVAILABLE = True
+except Exception:
+    PIL_AVAILABLE = False
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
+LOGO_PATH = os.getenv("WATERMARK_LOGO_PATH", os.path.join(ASSETS_DIR, "watermark.png"))
+FONT_PATH = os.getenv("WATERMARK_FONT_PATH", os.path.join(ASSETS_DIR, "watermark.ttf"))
+# Scaled logos are cached per width bucket (px) so near-identical sizes share an entry
+WIDTH_BUCKET = int(os.getenv("WATERMARK_WIDTH_BUCKET", "32"))
+CACHE_SIZE = int(os.getenv("WATERMARK_CACHE_SIZE", "32"))
+# How often (seconds) to stat the asset files for changes
+RECHECK_SECS = float(os.getenv("WATERMARK_RECHECK_SECS", "5"))
+OPACITY = 0.6
+
+# Font files tried in order after FONT_PATH; the first one that loads is remembered
+_FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+_ALPHA_LUT = [int(a * OPACITY) for a in range(256)]
+
+
+def _file_sig(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class WatermarkAssets:
+    """Per-process cache of the watermark logo and fonts.
+
+    The logo is decoded once; resized + alpha-adjusted variants are kept in an
+    LRU keyed by target width bucket. Everything is dropped when the logo or
+    font file changes on disk. Returned images are shared: do not mutate them.
+    """
+
+    def __init__(self, logo_path: str = LOGO_PATH, font_path: str = FONT_PATH,
+                 width_bucket: int = WIDTH_BUCKET, max_variants: int = CACHE_SIZE,
+                 recheck_secs: float = RECHECK_SECS):
+        self.logo_path = logo_path
+        self.font_path = font_path
+        self.width_bucket = max(1, width_bucket)
+        self.max_variants = max(1, max_variants)
+        self.recheck_secs = recheck_secs
+        self._lock = threading.Lock()
+        self._sigs = None
+        self._checked_at = 0.0
+        self._logo = None
+        self._logo_loaded = False
+        self._variants: "OrderedDict[int, object]" = OrderedDict()
+        self._font_source = None
+        self._fonts: "OrderedDict[int, object]" = OrderedDict()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._sigs is not None and now - self._checked_at < self.recheck_secs:
+            return
+        self._checked_at = now
+        sigs = (_file_sig(self.logo_path), _file_sig(self.font_path))
+        if sigs != self._sigs:
+            self._sigs = sigs
+            self._logo = None
+            self._logo_loaded = False
+            self._variants.clear()
+            self._font_source = None
+            self._fonts.clear()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._sigs = None
+            self._refresh()
+
+    def bucket_width(self, target_w: int) -> int:
+        b = self.width_bucket
+        return max(b, -(-target_w // b) * b)
+
+    def logo_for(self, target_w: int):
+        """Return the RGBA logo scaled to ~target_w with watermark opacity, or None."""
+        if not PIL_AVAILABLE:
+            return None
+        with self._lock:
+            self._refresh()
+            if not self._logo_loaded:
+                self._logo_loaded = True
+                if self._sigs[0] is not None:
+                    try:
+                        with Image.open(self.logo_path) as src:
+                            self._logo = src.convert("RGBA")
+                    except Exception as e:
+                        print(f"[watermark] could not load logo: {e}")
+            if self._logo is None:
+                return None
+            width = self.bucket_width(target_w)
+            variant = self._variants.get(width)
+            if variant is not None:
+                self._variants.move_to_end(width)
+                return variant
+            logo = self._logo
+            scale = width / logo.width
+            variant = logo.resize((width, max(1, int(logo.height * scale))), Image.LANCZOS)
+            variant.putalpha(variant.getchannel("A").point(_ALPHA_LUT))
+            self._variants[width] = variant
+            if len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+            return variant
+
+    def font(self, size: int):
+        if not PIL_AVAILABLE:
+            return None
+        with self._lock:
+            self._refresh()
+            cached = self._fonts.get(size)
+            if cached is not None:
+                self._fonts.move_to_end(size)
+                return cached
+            font = self._load_font(size)
+            self._fonts[size] = font
+            if len(self._fonts) > self.max_variants:
+                self._fonts.popitem(last=False)
+            return font
+
+    def _load_font(self, size: int):
+        if self._font_source is None:
+            # Resolve the usable font once instead of failing on every upload
+            self._font_source = ""
+            for candidate in (self.font_path,) + _FONT_CANDIDATES:
+                try:
+                    ImageFont.truetype(candidate, size)
+                    self._font_source = candidate
+                    break
+                except Exception:
+                    continue
+        if self._font_source:
+            return ImageFont.truetype(self._font_source, size)
+        try:
+            # Pillow >= 10.1 ships a scalable built-in font
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+watermark_assets = WatermarkAssets()
@@ -0,0 +1,58 @@
+"""Standalone job worker for JOB_QUEUE_MODE=external.
+
+    python -m app.worker                 # run workers until interrupted
+    python -m app.worker --requeue-dead  # give dead-lettered jobs another round
+    python -m app.worker --backfill-metadata  # queue metadata extraction for older photos
+
+Run it from backend/ with the same DATABASE_URL and uploads directory as the API.
+Several worker processes (or hosts sharing the database and storage) can run at once.
+"""
+import argparse
+import asyncio
+import signal
+
+from . import models  # noqa: F401 registers all tables on the metadata
+from .database import SessionLocal
+from .services import job_queue
+from .services import photo_service  # registers the render_photo and backfill_metadata handlers
+from .services.process_pool import image_pool
+
+
+async def _serve(workers: int) -> None:
+    pool = job_queue.JobWorkers(count=workers)
+    pool.start()
+    print(f"[jobs] {pool.count} worker(s) polling every {pool.poll_secs}s")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    await stop.wait()
+    print("[jobs] shutting down")
+    await pool.stop()
+    image_pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ClickScape background job worker")
+    parser.add_argument("--workers", type=int, default=job_queue.JOB_WORKERS)
+    parser.add_argument("--requeue-dead", action="store_true", help="requeue dead-lettered jobs and exit")
+    parser.add_argument("--backfill-metadata", action="store_true",
+                        help="queue the photo metadata backfill (run by the workers) and exit")
+    args = parser.parse_args()
+    if args.backfill_metadata:
+        with SessionLocal() as db:
+            job_id = photo_service.enqueue_metadata_backfill(db)
+        print(f"[jobs] queued metadata backfill job {job_id}" if job_id else "[jobs] metadata backfill already queued")
+        return
+    if args.requeue_dead:
+        with SessionLocal() as db:
+            print(f"[jobs] requeued {job_queue.requeue_dead(db)} dead job(s)")
+        return
+    asyncio.run(_serve(args.workers))
+
+
+if __name__ == "__main__":
+    main()
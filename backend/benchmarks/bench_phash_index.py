@@ -0,0 +1,53 @@
+"""Benchmark: near-duplicate lookups in the perceptual-hash index vs a linear scan.
+
+Run from backend/:
+    python -m benchmarks.bench_phash_index [--photos 1000000] [--radius 6] [--chunks 4]
+
+Random 64-bit hashes stand in for photos; each query is a stored hash with a
+few bits flipped, so every lookup has at least one true match.
+"""
+import argparse
+import random
+import time
+
+from app.services.phash_index import MultiIndexHamming
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--photos", type=int, default=1_000_000)
+    parser.add_argument("--radius", type=int, default=6)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    values = [rng.getrandbits(64) for _ in range(args.photos)]
+    index = MultiIndexHamming(chunks=args.chunks)
+    t = time.perf_counter()
+    for i, v in enumerate(values):
+        index.add(i, v)
+    print(f"build: {args.photos} hashes in {time.perf_counter() - t:.1f}s")
+
+    queries = []
+    for _ in range(args.queries):
+        q = values[rng.randrange(args.photos)]
+        for bit in rng.sample(range(64), rng.randint(0, args.radius)):
+            q ^= 1 << bit
+        queries.append(q)
+
+    t = time.perf_counter()
+    for q in queries:
+        assert index.search(q, args.radius)
+    per = (time.perf_counter() - t) / len(queries)
+    print(f"index lookup: {per * 1e6:.0f} us")
+
+    sample = queries[:20]
+    t = time.perf_counter()
+    for q in sample:
+        [i for i, v in enumerate(values) if (v ^ q).bit_count() <= args.radius]
+    print(f"linear scan:  {(time.perf_counter() - t) / len(sample) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark: legacy two-pass free-tier pipeline vs the fused render_free.
+
+Run from backend/:
+    python -m benchmarks.bench_upload_pipeline [--megapixels 24] [--runs 5]
+
+Legacy = decode -> watermark at full res -> JPEG q92 -> decode -> resize 1600 -> JPEG q82
+Fused  = draft decode -> resize 1600 -> watermark -> JPEG q82 (app.services.image_processing)
+Peak RSS is measured in a fresh process per variant so the numbers don't mix;
+the parent never decodes anything, since children inherit its peak RSS.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image, ImageFilter
+
+from app.services import image_processing
+
+
+def legacy_render_free(raw_bytes: bytes, orig_ext: str) -> tuple[bytes, str]:
+    # Pre-fusion behaviour kept here for comparison only
+    with Image.open(BytesIO(raw_bytes)) as im:
+        im = im.convert("RGBA")
+        logo = image_processing.watermark_assets.logo_for(max(96, int(min(im.size) * 0.35)))
+        if logo is not None:
+            im.alpha_composite(logo, ((im.width - logo.width) // 2, (im.height - logo.height) // 2))
+        buf = BytesIO()
+        im.convert("RGB").save(buf, format="JPEG", quality=92)
+    with Image.open(BytesIO(buf.getvalue())) as im:
+        ratio = min(1600 / im.width, 1600 / im.height, 1.0)
+        if ratio < 1.0:
+            im = im.resize((int(im.width * ratio), int(im.height * ratio)), Image.LANCZOS)
+        out = BytesIO()
+        im.save(out, format="JPEG", quality=82, optimize=True)
+        return out.getvalue(), ".jpg"
+
+
+VARIANTS = {
+    "legacy": legacy_render_free,
+    "fused": image_processing.render_free,
+}
+
+
+def make_jpeg(megapixels: float, path: str) -> None:
+    w = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    h = int(w * 3 / 4)
+    # Smooth gradient + noise so the encoder does realistic work
+    im = Image.radial_gradient("L").resize((w, h)).convert("RGB")
+    noise = Image.effect_noise((w // 4, h // 4), 40).resize((w, h)).filter(ImageFilter.GaussianBlur(1))
+    im = Image.merge("RGB", (im.getchannel(0), noise, im.getchannel(2)))
+    im.save(path, format="JPEG", quality=95)
+
+
+def _measure(name: str, path: str, runs: int, queue) -> None:
+    fn = VARIANTS[name]
+    with open(path, "rb") as f:
+        raw = f.read()
+    fn(raw, ".jpg")  # warm caches (watermark assets, codecs)
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out, _ext = fn(raw, ".jpg")
+        timings.append(time.perf_counter() - t0)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((name, min(timings), sum(timings) / len(timings), peak_mb, len(out)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=24.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "input.jpg")
+        proc = ctx.Process(target=make_jpeg, args=(args.megapixels, path))
+        proc.start()
+        proc.join()
+        print(f"input: {args.megapixels:.0f} MP JPEG, {os.path.getsize(path) / 1e6:.1f} MB, {args.runs} runs")
+        queue = ctx.Queue()
+        for name in VARIANTS:
+            proc = ctx.Process(target=_measure, args=(name, path, args.runs, queue))
+            proc.start()
+            name, best, mean, peak_mb, out_size = queue.get()
+            proc.join()
+            print(f"{name:>7}: best {best * 1000:7.1f} ms  mean {mean * 1000:7.1f} ms  "
+                  f"peak RSS {peak_mb:6.0f} MB  output {out_size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models.user import User
+from tests.test_plans import make_image_bytes, signup
+
+client = TestClient(app)
+
+DATA = {"title": "", "category": "batch", "tags": "", "price": "0"}
+
+
+def test_batch_reports_per_item_results():
+    headers = signup("batch_prem@example.com", plan="premium")
+    files = [
+        ("images", ("a.jpg", make_image_bytes(color=(1, 1, 1)), "image/jpeg")),
+        ("images", ("b.gif", b"GIF89a", "image/gif")),
+        ("images", ("c.png", make_image_bytes(fmt="PNG", color=(2, 2, 2)), "image/png")),
+        ("images", ("d.jpg", b"not an image", "image/jpeg")),
+    ]
+    r = client.post("/photos/upload/batch", files=files, data=DATA, headers=headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["uploaded"], body["failed"]) == (2, 2)
+    items = body["items"]
+    assert [it["filename"] for it in items] == ["a.jpg", "b.gif", "c.png", "d.jpg"]
+    assert items[0]["photo"]["title"] == "a.jpg"
+    assert "Unsupported file type" in items[1]["error"]
+    assert items[2]["photo"]["processed_url"]
+    assert "Could not read image" in items[3]["error"]
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "batch_prem@example.com").first()
+        stored = sum(it["photo"]["bytes_size"] for it in items if it["photo"])
+        assert user.storage_used == stored
+
+
+def test_batch_duplicate_images_in_one_request():
+    headers = signup("batch_dup@example.com", plan="premium")
+    img = make_image_bytes(color=(3, 3, 3))
+    files = [("images", (f"same{i}.jpg", img, "image/jpeg")) for i in range(3)]
+    r = client.post("/photos/upload/batch", files=files, data=DATA, headers=headers)
+    assert r.status_code == 200, r.text
+    urls = {it["photo"]["original_url"] for it in r.json()["items"]}
+    assert len(urls) == 1
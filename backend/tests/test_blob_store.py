@@ -0,0 +1,58 @@
+import os
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models.blob import Blob
+from app.services.storage import url_to_path
+from tests.test_plans import make_image_bytes, signup
+
+client = TestClient(app)
+
+
+def _upload(headers, img, name="dup.jpg"):
+    files = {
+        "title": (None, "Dup"),
+        "category": (None, "dedup"),
+        "tags": (None, ""),
+        "price": (None, "0"),
+        "image": (name, img, "image/jpeg"),
+    }
+    r = client.post("/photos/upload", files=files, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _refcount(url):
+    with SessionLocal() as db:
+        blob = db.query(Blob).filter(Blob.url == url).first()
+        return blob.refcount if blob else 0
+
+
+def test_identical_uploads_share_files_and_release_on_delete():
+    img = make_image_bytes(size=(900, 700), color=(1, 2, 3))
+    h1 = signup("dedup_a@example.com")
+    h2 = signup("dedup_b@example.com")
+    a = _upload(h1, img)
+    b = _upload(h2, img, name="again.jpg")
+    assert a["processed_url"] == b["processed_url"]
+    assert a["derivatives"] == b["derivatives"]
+    assert _refcount(a["processed_url"]) == 2
+
+    path = url_to_path(a["processed_url"])
+    assert client.delete(f"/photos/{a['id']}", headers=h1).status_code == 200
+    assert os.path.isfile(path)
+    assert _refcount(a["processed_url"]) == 1
+    assert client.delete(f"/photos/{b['id']}", headers=h2).status_code == 200
+    assert not os.path.exists(path)
+    assert _refcount(a["processed_url"]) == 0
+
+
+def test_premium_dedup_still_charges_each_user():
+    img = make_image_bytes(size=(640, 480), color=(7, 8, 9))
+    h1 = signup("dedup_p1@example.com", plan="premium")
+    h2 = signup("dedup_p2@example.com", plan="premium")
+    a = _upload(h1, img)
+    b = _upload(h2, img)
+    assert a["original_url"] == b["original_url"]
+    assert a["bytes_size"] == b["bytes_size"] == len(img)
+    assert _refcount(a["original_url"]) == 2
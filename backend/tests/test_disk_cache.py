@@ -0,0 +1,42 @@
+import asyncio
+import os
+
+from app.services.disk_cache import DiskLRUCache
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = DiskLRUCache("t", str(tmp_path), max_bytes=250)
+    a = cache.put("a", b"x" * 100, ".bin")
+    cache.put("b", b"y" * 100, ".bin")
+    assert cache.get("a") == a  # touch: b is now least recently used
+    cache.put("c", b"z" * 100, ".bin")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["bytes"] == 200 and cache.stats()["evictions"] == 1
+
+
+def test_index_rebuilt_from_disk(tmp_path):
+    DiskLRUCache("t", str(tmp_path), max_bytes=1000).put("k", b"data", ".jpg")
+    reopened = DiskLRUCache("t", str(tmp_path), max_bytes=1000)
+    path = reopened.get("k")
+    assert path and open(path, "rb").read() == b"data"
+
+
+def test_get_or_create_is_single_flight(tmp_path):
+    cache = DiskLRUCache("t", str(tmp_path), max_bytes=1000)
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"rendered", ".png"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_create("same", produce) for _ in range(5)))
+
+    paths = asyncio.run(main())
+    assert len(calls) == 1 and len(set(paths)) == 1 and os.path.isfile(paths[0])
+    stats = cache.stats()
+    assert (stats["misses"], stats["joined"]) == (1, 4)
+    assert asyncio.run(cache.get_or_create("same", produce)) == paths[0]
+    assert len(calls) == 1 and cache.stats()["hits"] == 1
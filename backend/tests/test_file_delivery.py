@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import quote
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.secure import SECRET
+from app.services import file_delivery
+from app.services.blob_store import put_bytes
+from app.services.storage import url_to_path
+
+client = TestClient(app)
+
+
+def _signed(url: str) -> str:
+    exp = int(time.time()) + 60
+    sig = hmac.new(SECRET.encode(), f"{url}|{exp}".encode(), hashlib.sha256).hexdigest()
+    return f"/secure/download?path={quote(url)}&exp={exp}&sig={sig}"
+
+
+def test_direct_download_supports_ranges():
+    data = os.urandom(5000)
+    url = put_bytes(data, ".tif")
+    r = client.get(_signed(url))
+    assert r.status_code == 200 and r.content == data
+    assert r.headers["content-disposition"].startswith("attachment")
+    r = client.get(_signed(url), headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206 and r.content == data[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(data)}"
+
+
+def test_proxy_modes_send_no_body(monkeypatch):
+    url = put_bytes(os.urandom(1000), ".tif")
+    relpath = os.path.relpath(url_to_path(url), file_delivery.UPLOAD_DIR)
+
+    monkeypatch.setattr(file_delivery, "DOWNLOAD_DELIVERY", "x-accel")
+    r = client.get(_signed(url))
+    assert r.status_code == 200 and r.content == b""
+    assert r.headers["x-accel-redirect"] == "/_protected/uploads/" + relpath
+    assert r.headers["cache-control"].startswith("private")
+    assert r.headers["content-disposition"] == f'attachment; filename="{os.path.basename(relpath)}"'
+
+    monkeypatch.setattr(file_delivery, "DOWNLOAD_DELIVERY", "x-sendfile")
+    r = client.get(_signed(url))
+    assert r.content == b"" and r.headers["x-sendfile"] == url_to_path(url)
+
+    assert client.get(_signed(url).replace("sig=", "sig=0")).status_code == 403
+
+
+def _call_zero_copy(path: str, headers: list) -> list:
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == file_delivery.ZEROCOPY_EXTENSION:
+            f = message["file"]
+            f.seek(message["offset"])
+            message = dict(message, body=f.read(message["count"]))
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": headers,
+             "extensions": {file_delivery.ZEROCOPY_EXTENSION: {}}}
+    asyncio.run(file_delivery.ZeroCopyFileResponse(path, filename="x.bin")(scope, receive, send))
+    return sent
+
+
+def test_zero_copy_extension_whole_file_and_single_range():
+    data = os.urandom(3000)
+    path = url_to_path(put_bytes(data, ".bin"))
+
+    start, body = _call_zero_copy(path, [])
+    assert start["status"] == 200 and body["body"] == data
+
+    start, body = _call_zero_copy(path, [(b"range", b"bytes=-500")])
+    assert start["status"] == 206 and body["body"] == data[-500:]
+    assert (b"content-range", f"bytes 2500-2999/{len(data)}".encode()) in start["headers"]
+
+    # Multipart ranges fall back to the regular streaming path
+    messages = _call_zero_copy(path, [(b"range", b"bytes=0-9,20-29")])
+    assert messages[0]["status"] == 206
+    assert all(m["type"] != file_delivery.ZEROCOPY_EXTENSION for m in messages)
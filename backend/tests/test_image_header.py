@@ -0,0 +1,79 @@
+import io
+import struct
+import uuid
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services.image_header import UnrecognizedImage, read_header
+
+client = TestClient(app)
+
+
+def _encode(fmt, size=(123, 45), **kwargs):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (10, 200, 30)).save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _png_header_only(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+@pytest.mark.parametrize("fmt,kwargs,expected", [
+    ("JPEG", {}, "jpeg"),
+    ("JPEG", {"progressive": True, "exif": b"Exif\x00\x00" + b"\x00" * 60000}, "jpeg"),
+    ("PNG", {}, "png"),
+    ("TIFF", {}, "tiff"),
+    ("TIFF", {"compression": "tiff_lzw"}, "tiff"),
+])
+def test_reads_format_and_size_from_header(fmt, kwargs, expected):
+    header = read_header(io.BytesIO(_encode(fmt, **kwargs)))
+    assert (header.format, header.width, header.height) == (expected, 123, 45)
+
+
+def test_big_endian_tiff_and_psd():
+    # Minimal big-endian TIFF: one IFD with SHORT width and LONG length
+    ifd = struct.pack(">H", 2) + struct.pack(">HHIHH", 256, 3, 1, 640, 0) + struct.pack(">HHII", 257, 4, 1, 480)
+    assert read_header(io.BytesIO(b"MM\x00*" + struct.pack(">I", 8) + ifd + b"\x00" * 4)).width == 640
+    psd = b"8BPS" + struct.pack(">H6sHIIHH", 1, b"", 3, 300, 400, 8, 3)
+    header = read_header(io.BytesIO(psd))
+    assert (header.format, header.width, header.height) == ("psd", 400, 300)
+
+
+@pytest.mark.parametrize("data", [b"", b"GIF89a" + b"\x00" * 40, b"\xff\xd8\xff\xe0\x00", b"II*\x00\xff\xff\xff\x00"])
+def test_rejects_unknown_or_truncated(data):
+    with pytest.raises(UnrecognizedImage):
+        read_header(io.BytesIO(data))
+
+
+def _upload(name, data):
+    email = f"hdr_{uuid.uuid4().hex[:8]}@example.com"
+    r = client.post("/auth/signup", json={"email": email, "password": "password123",
+                                          "role": "participant", "plan": "free"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    files = {"title": (None, "t"), "category": (None, "c"), "price": (None, "0"), "image": (name, data)}
+    return client.post("/photos/upload", files=files, headers=headers)
+
+
+def test_upload_rejects_bombs_and_renamed_files_before_decoding():
+    r = _upload("bomb.png", _png_header_only(60000, 60000))
+    assert r.status_code == 400 and "megapixels" in r.text
+
+    # A TIFF renamed to .jpg is still a TIFF, which free accounts can't upload
+    r = _upload("renamed.jpg", _encode("TIFF"))
+    assert r.status_code == 400 and "Unsupported file type" in r.text
+
+    r = _upload("notes.jpg", b"just some text, not an image at all")
+    assert r.status_code == 400 and "Could not read image file" in r.text
+
+
+def test_upload_stores_real_extension():
+    r = _upload("actually_png.jpg", _encode("PNG"))
+    assert r.status_code == 200
+    assert r.json()["processed_url"].endswith(".png")
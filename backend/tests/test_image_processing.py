@@ -0,0 +1,57 @@
+import io
+from PIL import Image
+from app.services import image_processing
+
+
+def _jpeg(size, mode="RGB"):
+    buf = io.BytesIO()
+    Image.new(mode, size, 128).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_render_free_downscales_and_encodes_once():
+    out, ext = image_processing.render_free(_jpeg((4000, 3000)), ".jpeg")
+    assert ext == ".jpg"
+    with Image.open(io.BytesIO(out)) as im:
+        assert im.format == "JPEG"
+        assert im.size == (1600, 1200)
+
+
+def test_render_preview_keeps_small_images_and_png():
+    buf = io.BytesIO()
+    Image.new("RGBA", (300, 200), (10, 20, 30, 255)).save(buf, format="PNG")
+    out, ext = image_processing.render_preview(buf.getvalue(), ".png")
+    assert ext == ".png"
+    with Image.open(io.BytesIO(out)) as im:
+        assert im.size == (300, 200)
+        assert im.mode == "RGB"
+
+
+def test_render_preview_keeps_grayscale():
+    out, _ = image_processing.render_preview(_jpeg((2000, 1000), mode="L"), ".jpg")
+    with Image.open(io.BytesIO(out)) as im:
+        assert im.mode == "L"
+        assert im.size == (1600, 800)
+
+
+def test_render_derivatives_ladder_and_formats():
+    out = image_processing.render_derivatives(_jpeg((3000, 2000)), ".jpg", watermark=True)
+    assert list(out) == ["full", "large", "card", "thumb"]
+    assert (out["full"]["width"], out["thumb"]["width"]) == (1600, 320)
+    for entry in out.values():
+        assert "jpeg" in entry["files"]
+        assert set(image_processing.enabled_formats()) <= set(entry["files"])
+
+
+def test_render_derivatives_skips_sizes_larger_than_source():
+    out = image_processing.render_derivatives(_jpeg((500, 400)), ".jpg", watermark=False)
+    assert list(out) == ["full", "thumb"]
+    assert out["full"]["width"] == 500
+
+
+def test_negotiate_format():
+    available = ["jpeg", "webp", "avif"]
+    assert image_processing.negotiate_format("image/avif,image/webp,*/*", available) == "avif"
+    assert image_processing.negotiate_format("image/webp,*/*", available) == "webp"
+    assert image_processing.negotiate_format("image/avif;q=0,image/webp", available) == "webp"
+    assert image_processing.negotiate_format("*/*", available) == "jpeg"
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services import image_transform
+from app.services.disk_cache import DiskLRUCache
+from tests.test_plans import make_image_bytes, signup
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _cache(tmp_path, monkeypatch):
+    cache = DiskLRUCache("img", str(tmp_path), 10 * 1024 * 1024)
+    monkeypatch.setattr(image_transform, "transform_cache", cache)
+    return cache
+
+
+def _photo_id(email):
+    files = {
+        "title": (None, "T"), "category": (None, "transform"), "tags": (None, ""), "price": (None, "0"),
+        "image": ("t.jpg", make_image_bytes(size=(2000, 1000)), "image/jpeg"),
+    }
+    r = client.post("/photos/upload", files=files, headers=signup(email))
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_whitelisted_resize_and_cover_crop(_cache):
+    pid = _photo_id("img_white@example.com")
+    r = client.get(f"/img/{pid}?w=320&fmt=jpeg")
+    assert r.status_code == 200 and r.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(r.content)).size == (320, 160)
+
+    r = client.get(f"/img/{pid}?w=240&h=240&fit=cover&fmt=webp")
+    assert r.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(r.content)).size == (240, 240)
+
+    client.get(f"/img/{pid}?w=320&fmt=jpeg")
+    assert _cache.stats()["hits"] == 1 and _cache.stats()["misses"] == 2
+
+
+def test_auto_format_follows_accept():
+    pid = _photo_id("img_auto@example.com")
+    r = client.get(f"/img/{pid}?w=160", headers={"Accept": "image/webp,image/*"})
+    assert r.headers["content-type"] == "image/webp"
+    assert "Accept" in r.headers["vary"]
+    r = client.get(f"/img/{pid}?w=160", headers={"Accept": "image/jpeg"})
+    assert r.headers["content-type"] == "image/jpeg"
+
+
+def test_off_whitelist_requires_signature():
+    pid = _photo_id("img_signed@example.com")
+    assert client.get(f"/img/{pid}?w=333&fmt=jpeg").status_code == 403
+    params = image_transform.TransformParams(w=333, fmt="jpeg")
+    sig = image_transform.sign(pid, params)
+    r = client.get(f"/img/{pid}?w=333&fmt=jpeg&sig={sig}")
+    assert r.status_code == 200
+    assert Image.open(io.BytesIO(r.content)).width == 333
+    assert client.get(f"/img/{pid}?w=333&fmt=jpeg&sig={sig}&q=50").status_code == 403
+    assert client.get(f"/img/{pid}?w=320&fit=stretch").status_code == 400
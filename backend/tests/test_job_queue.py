@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models.job import Job
+from app.services import job_queue
+from tests.test_plans import make_image_bytes, signup
+
+client = TestClient(app)
+
+
+def _upload(headers, color=(10, 20, 30)):
+    files = {
+        "title": (None, "Queued"),
+        "category": (None, "jobs"),
+        "tags": (None, ""),
+        "price": (None, "0"),
+        "image": ("q.jpg", make_image_bytes(color=color), "image/jpeg"),
+    }
+    r = client.post("/photos/upload", files=files, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_upload_returns_processing_until_worker_runs(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_MODE", "external")
+    body = _upload(signup("jobs_ext@example.com"))
+    assert body["status"] == "processing"
+    assert body["processed_url"] is None and not body["derivatives"]
+    assert client.get(f"/photos/{body['id']}/status").json()["status"] == "processing"
+    assert body["id"] not in [p["id"] for p in client.get("/photos?category=jobs").json()]
+
+    assert asyncio.run(job_queue.run_next("test-worker"))
+    status = client.get(f"/photos/{body['id']}/status").json()
+    assert status["status"] == "ready" and status["attempts"] == 1
+    photo = client.get(f"/photos/{body['id']}").json()
+    assert photo["processed_url"] and set(photo["derivatives"]) >= {"thumb", "full"}
+
+
+def test_embedded_workers_render_in_background():
+    headers = signup("jobs_embedded@example.com")
+    with TestClient(app) as live:
+        files = {"title": (None, "Bg"), "category": (None, "jobs"), "tags": (None, ""), "price": (None, "0"),
+                 "image": ("bg.jpg", make_image_bytes(color=(40, 50, 60)), "image/jpeg")}
+        body = live.post("/photos/upload", files=files, headers=headers).json()
+        deadline = time.time() + 30
+        status = body["status"]
+        while status != "ready" and time.time() < deadline:
+            time.sleep(0.1)
+            status = live.get(f"/photos/{body['id']}/status").json()["status"]
+    assert status == "ready"
+
+
+def test_failed_jobs_retry_then_dead_letter():
+    seen = {"runs": 0, "dead": None}
+
+    async def flaky(db, payload):
+        seen["runs"] += 1
+        raise RuntimeError("boom")
+
+    def on_dead(db, payload, error):
+        seen["dead"] = (payload["n"], error)
+
+    job_queue.register("test_flaky", flaky, on_dead=on_dead)
+    with SessionLocal() as db:
+        job = job_queue.enqueue(db, "test_flaky", {"n": 7}, max_attempts=2)
+        db.commit()
+        job_id = job.id
+
+    asyncio.run(job_queue.run_jobs([job_id]))
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        assert (job.status, job.attempts) == ("queued", 1)
+        assert "boom" in job.last_error and job.run_after > time.time()
+        job.run_after = 0  # skip the backoff
+        db.commit()
+
+    asyncio.run(job_queue.run_jobs([job_id]))
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        assert (job.status, job.attempts) == ("dead", 2)
+    assert seen["runs"] == 2
+    assert seen["dead"] == (7, "RuntimeError: boom")
+
+    with SessionLocal() as db:
+        assert job_queue.requeue_dead(db, "test_flaky") == 1
+        assert db.get(Job, job_id).status == "queued"
+        db.get(Job, job_id).status = "done"  # keep the table tidy for other tests
+        db.commit()
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import ai as ai_routes
+from app.services.model_sessions import ModelSessionPool
+from app.services.process_pool import PoolBusyError
+
+client = TestClient(app)
+
+
+class FakeSession:
+    created = 0
+
+    def __init__(self):
+        FakeSession.created += 1
+        self.warm = False
+        self.calls = 0
+
+
+def _pool(size=2, wait_secs=5.0, factory=FakeSession, retry_secs=60.0):
+    def warm(session):
+        session.warm = True
+    return ModelSessionPool("fake", factory, size, warmup=warm, wait_secs=wait_secs, retry_secs=retry_secs)
+
+
+def test_sessions_are_created_once_warmed_and_reused():
+    FakeSession.created = 0
+    pool = _pool(size=2)
+    pool.start()
+
+    def infer(session, x):
+        assert session.warm
+        session.calls += 1
+        time.sleep(0.01)
+        return id(session), x * 2
+
+    async def many():
+        return await asyncio.gather(*(pool.run(infer, i) for i in range(20)))
+
+    results = asyncio.run(many())
+    assert [r[1] for r in results] == [i * 2 for i in range(20)]
+    assert len({r[0] for r in results}) <= 2
+    assert FakeSession.created == 2
+    assert pool.stats()["served"] == 20 and pool.stats()["in_use"] == 0
+
+
+def test_busy_pool_raises_pool_busy():
+    pool = _pool(size=1, wait_secs=0.2)
+    release = threading.Event()
+
+    async def scenario():
+        hold = asyncio.ensure_future(pool.run(lambda s: release.wait(2)))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolBusyError):
+            await pool.run(lambda s: None)
+        release.set()
+        await hold
+
+    asyncio.run(scenario())
+
+
+def test_failed_load_is_reported_and_retried():
+    attempts = {"n": 0}
+
+    def flaky():
+        attempts["n"] += 1
+        if attempts["n"] == 1:
+            raise OSError("model file missing")
+        return FakeSession()
+
+    pool = _pool(size=1, factory=flaky, retry_secs=0.2)
+    pool.start()
+    with pytest.raises(RuntimeError, match="model file missing"):
+        asyncio.run(pool.run(lambda s: None))
+    assert pool.state == "failed" and attempts["n"] == 1
+    # Requests after the retry interval trigger a reload
+    time.sleep(0.25)
+    assert asyncio.run(pool.run(lambda s: "ok")) == "ok" and pool.ready
+
+
+def test_ready_endpoint(monkeypatch):
+    pool = _pool(size=1)
+    monkeypatch.setattr(ai_routes, "rembg_sessions", pool)
+    monkeypatch.setattr(ai_routes.ai_service, "bg_api_url", "")
+    r = client.get("/ai/ready")
+    assert r.status_code == 503 and r.json()["rembg"]["state"] == "idle"
+    pool.start()
+    pool._loaded.wait(5)
+    r = client.get("/ai/ready")
+    assert r.status_code == 200 and r.json()["ready"] is True
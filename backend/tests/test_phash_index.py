@@ -0,0 +1,68 @@
+import io
+import random
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services.phash_index import MultiIndexHamming, hamming
+from tests.test_plans import signup
+
+client = TestClient(app)
+
+
+def _fractal_bytes(size=(900, 600), quality=90, shift=0.0):
+    im = Image.effect_mandelbrot(size, (-2 + shift, -1.2, 1 + shift, 1.2), 80).convert("RGB")
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _upload(headers, data, category="dups"):
+    files = {"title": (None, "F"), "category": (None, category), "tags": (None, ""), "price": (None, "0"),
+             "image": ("f.jpg", data, "image/jpeg")}
+    r = client.post("/photos/upload", files=files, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_multi_index_matches_brute_force():
+    rng = random.Random(7)
+    index = MultiIndexHamming(chunks=4)
+    values = {i: rng.getrandbits(64) for i in range(3000)}
+    base = values[0]
+    for i in range(3000, 3040):  # planted near neighbours of values[0]
+        v = base
+        for bit in rng.sample(range(64), rng.randint(0, 9)):
+            v ^= 1 << bit
+        values[i] = v
+    for i, v in values.items():
+        index.add(i, v)
+    for radius in (0, 3, 6, 9):
+        expected = sorted((i, hamming(base, v)) for i, v in values.items() if hamming(base, v) <= radius)
+        assert sorted(index.search(base, radius)) == expected
+    index.remove(0)
+    assert 0 not in [i for i, _ in index.search(base, 0)]
+
+
+def test_upload_links_near_duplicate_and_lists_similar():
+    first = _upload(signup("phash_a@example.com"), _fractal_bytes())
+    # Same frame, smaller and recompressed, by someone else
+    second = _upload(signup("phash_b@example.com"), _fractal_bytes(size=(600, 400), quality=60))
+    other = _upload(signup("phash_c@example.com"), _fractal_bytes(shift=0.9))
+    assert first["duplicate_of"] is None
+    assert second["duplicate_of"] == first["id"]
+    assert other["duplicate_of"] != first["id"]
+    similar = [p["id"] for p in client.get(f"/photos/{first['id']}/similar").json()]
+    assert second["id"] in similar and other["id"] not in similar
+
+
+def test_competition_rejects_same_frame_in_another_category():
+    headers = signup("phash_comp@example.com")
+    assert client.post("/competitions/join", json={"plan": "enthusiast"}, headers=headers).status_code == 200
+    a = _upload(headers, _fractal_bytes(shift=0.4), category="nature")
+    b = _upload(headers, _fractal_bytes(size=(700, 466), shift=0.4), category="street")
+    assert client.post(f"/competitions/submit?photo_id={a['id']}", headers=headers).status_code == 200
+    r = client.post(f"/competitions/submit?photo_id={b['id']}", headers=headers)
+    assert r.status_code == 409
+    assert "nature" in r.json()["detail"]
@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from tests.test_plans import make_image_bytes, signup
+
+client = TestClient(app)
+
+
+def _upload(headers, size=(2400, 1600)):
+    files = {
+        "title": (None, "Deriv"),
+        "category": (None, "derivatives"),
+        "tags": (None, ""),
+        "price": (None, "0"),
+        "image": ("d.jpg", make_image_bytes(size=size), "image/jpeg"),
+    }
+    r = client.post("/photos/upload", files=files, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_upload_exposes_derivatives_and_srcset():
+    body = _upload(signup("deriv_free@example.com"))
+    assert set(body["derivatives"]) == {"thumb", "card", "large", "full"}
+    assert body["processed_url"] == body["derivatives"]["full"]["jpeg"]
+    assert body["srcset"]["jpeg"].endswith("1600w")
+
+
+def test_image_endpoint_negotiates_format():
+    body = _upload(signup("deriv_neg@example.com"))
+    r = client.get(f"/photos/{body['id']}/image?size=thumb", headers={"Accept": "image/webp,*/*"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert "Accept" in r.headers["vary"]
+    r2 = client.get(f"/photos/{body['id']}/image?size=thumb", headers={"Accept": "image/jpeg"})
+    assert r2.headers["content-type"] == "image/jpeg"
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import json
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.services import image_processing, job_queue
+from app.services.blob_store import put_bytes
+from app.services.photo_service import enqueue_metadata_backfill
+from tests.test_plans import signup
+
+client = TestClient(app)
+
+
+def _jpeg_with_exif(size, color=(90, 60, 30)):
+    exif = Image.Exif()
+    exif[0x010F] = "Canon"
+    exif[0x0110] = "EOS R6"
+    exif[0x0112] = 1
+    exif.get_ifd(0x8769)[0x8827] = 400
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+def test_image_metadata_reads_header_and_exif():
+    meta = image_processing.image_metadata(_jpeg_with_exif((640, 480)))
+    assert (meta["width"], meta["height"], meta["format"]) == (640, 480, "jpeg")
+    assert meta["exif"] == {"make": "Canon", "model": "EOS R6", "orientation": 1, "iso": 400}
+
+
+def _upload(headers, name, data):
+    files = {"title": (None, name), "category": (None, "meta"), "tags": (None, ""), "price": (None, "0"),
+             "image": (name, data, "image/jpeg")}
+    r = client.post("/photos/upload", files=files, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_upload_stores_metadata_and_filters_use_it():
+    headers = signup("meta_user@example.com")
+    wide = _upload(headers, "wide.jpg", _jpeg_with_exif((3000, 2000)))
+    assert (wide["width"], wide["height"], wide["megapixels"]) == (3000, 2000, 6.0)
+    assert wide["orientation"] == "landscape" and wide["image_format"] == "jpeg"
+    assert wide["exif"]["model"] == "EOS R6"
+    tall = _upload(headers, "tall.jpg", _jpeg_with_exif((600, 900), color=(10, 120, 200)))
+    assert tall["orientation"] == "portrait"
+
+    ids = lambda q: {p["id"] for p in client.get(f"/photos?category=meta&{q}").json()}  # noqa: E731
+    assert tall["id"] in ids("orientation=portrait") and wide["id"] not in ids("orientation=portrait")
+    assert ids("min_megapixels=5") >= {wide["id"]} and tall["id"] not in ids("min_megapixels=5")
+    assert client.get("/photos?orientation=sideways").status_code == 422
+
+
+def test_backfill_job_fills_older_rows():
+    with SessionLocal() as db:
+        photo = Photo(title="legacy", category="meta-legacy", status="ready",
+                      original_url=put_bytes(_jpeg_with_exif((800, 800)), ".jpg"))
+        db.add(photo)
+        db.commit()
+        photo_id = photo.id
+        job_id = enqueue_metadata_backfill(db, batch=5)
+        assert enqueue_metadata_backfill(db) is None  # one run at a time
+    for _ in range(100):
+        asyncio.run(job_queue.run_jobs([job_id]))
+        with SessionLocal() as db:
+            latest = job_queue.latest_for(db, "backfill_metadata")
+            if latest.status != "queued":
+                break
+            job_id = latest.id
+    with SessionLocal() as db:
+        photo = db.get(Photo, photo_id)
+        assert (photo.width, photo.orientation, photo.megapixels) == (800, "square", 0.64)
+        assert json.loads(photo.exif)["make"] == "Canon"
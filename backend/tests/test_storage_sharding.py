@@ -0,0 +1,74 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app import migrate_uploads
+from app.database import SessionLocal
+from app.main import app
+from app.models.photo import Photo
+from app.services import storage
+
+client = TestClient(app)
+
+
+def test_sharded_urls_and_legacy_resolution():
+    name = "ai_abcdef0123.png"
+    assert storage.relpath_for(name) == "ab/cd/ai_abcdef0123.png"
+    assert storage.url_for(name) == "/uploads/ab/cd/ai_abcdef0123.png"
+    assert storage.canonical_url("/uploads/ai_abcdef0123.png") == storage.url_for(name)
+    # Non-hex names still get a stable shard
+    assert storage.relpath_for("logo.png") == storage.relpath_for("logo.png")
+    for bad in ("/uploads/../x.jpg", "/uploads/.incoming/x.jpg", "/uploads/zz/cd/ai_abcdef0123.png",
+                "/uploads/12/34/ai_abcdef0123.png", "/static/x.jpg"):
+        assert storage.url_to_path(bad) is None
+
+
+def test_flat_url_served_from_shard_and_vice_versa():
+    name = "c0ffee5678.jpg"
+    path = storage.path_for(name)
+    with open(path, "wb") as f:
+        f.write(b"moved")
+    assert client.get(f"/uploads/{name}").content == b"moved"
+    assert client.get(storage.url_for(name)).content == b"moved"
+    os.remove(path)
+    with open(os.path.join(storage.UPLOAD_DIR, name), "wb") as f:
+        f.write(b"not yet moved")
+    assert client.get(storage.url_for(name)).content == b"not yet moved"
+    os.remove(os.path.join(storage.UPLOAD_DIR, name))
+
+
+def test_migration_moves_files_and_rewrites_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(migrate_uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(migrate_uploads, "STATE_PATH", str(tmp_path / ".state.json"))
+    name = "feedface1234.jpg"
+    flat = tmp_path / name
+    flat.write_bytes(b"legacy-bytes")
+    with SessionLocal() as db:
+        photo = Photo(title="legacy", category="old", url=f"/uploads/{name}", processed_url=f"/uploads/{name}",
+                      derivatives='{"full": {"width": 1, "height": 1, "jpeg": "/uploads/%s"}}' % name)
+        db.add(photo)
+        db.commit()
+        photo_id = photo.id
+
+    assert storage.url_to_path(f"/uploads/{name}") == str(flat)
+    assert migrate_uploads.migrate_files() == {"moved": 1, "duplicates": 0, "conflicts": 0}
+    sharded = storage.url_for(name)
+    assert not flat.exists()
+    assert storage.url_to_path(f"/uploads/{name}") == storage.url_to_path(sharded)
+    assert open(storage.url_to_path(sharded), "rb").read() == b"legacy-bytes"
+
+    migrate_uploads.migrate_rows(batch=2)
+    with SessionLocal() as db:
+        photo = db.get(Photo, photo_id)
+        assert photo.url == sharded and photo.processed_url == sharded
+        assert sharded in photo.derivatives
+    # Resumable: a second run starts from the checkpoint and has nothing left to do
+    assert migrate_uploads.migrate_rows(batch=2)["photos"] == 0
+
+
+def test_dotfiles_are_not_served():
+    os.makedirs(os.path.join(storage.UPLOAD_DIR, ".incoming"), exist_ok=True)
+    with open(os.path.join(storage.UPLOAD_DIR, ".incoming", "tmp.jpg"), "wb") as f:
+        f.write(b"secret")
+    assert client.get("/uploads/.incoming/tmp.jpg").status_code == 404
@@ -0,0 +1,44 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.services import upload_ingest
+from app.services.upload_ingest import ingest_upload, UploadTooLarge
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def test_ingest_hashes_and_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_ingest, "INGEST_TMP_DIR", str(tmp_path))
+    data = os.urandom(700_000)
+    up = UploadFile(file=io.BytesIO(data), filename="x.jpg")
+    f = asyncio.run(ingest_upload(up, max_bytes=1_000_000, ext=".jpg"))
+    assert f.size == len(data)
+    assert f.sha256 == hashlib.sha256(data).hexdigest()
+    assert f.read_bytes() == data
+    f.discard()
+    assert not os.path.exists(f.path)
+
+
+def test_ingest_aborts_early_when_over_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_ingest, "INGEST_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(upload_ingest, "CHUNK_SIZE", 64 * 1024)
+    src = CountingFile(os.urandom(5_000_000))
+    up = UploadFile(file=src, filename="big.jpg")
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(ingest_upload(up, max_bytes=200_000, ext=".jpg"))
+    assert src.bytes_read < 400_000
+    assert os.listdir(tmp_path) == []
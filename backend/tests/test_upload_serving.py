@@ -0,0 +1,58 @@
+import gzip
+import hashlib
+import os
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import storage
+from app.services.blob_store import put_bytes
+
+client = TestClient(app)
+
+
+def test_content_addressed_file_gets_immutable_digest_etag():
+    data = os.urandom(4096)
+    url = put_bytes(data, ".jpg")
+    r = client.get(url)
+    assert r.status_code == 200 and r.content == data
+    assert "immutable" in r.headers["cache-control"]
+    assert r.headers["etag"] == f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+    r304 = client.get(url, headers={"If-None-Match": r.headers["etag"]})
+    assert r304.status_code == 304 and not r304.content
+    assert r304.headers["etag"] == r.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_range_requests():
+    data = bytes(range(256)) * 8
+    url = put_bytes(data, ".bin")
+    r = client.get(url, headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == data[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(data)}"
+    # A stale If-Range validator gets the whole file
+    r = client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert r.status_code == 200 and len(r.content) == len(data)
+
+
+def test_random_named_file_is_hashed_once_and_sidecar_served():
+    name = "avatar_1_0123456789abcdef0123456789abcdef.svg"
+    path = storage.path_for(name)
+    body = b"<svg xmlns='http://www.w3.org/2000/svg'>" + b" " * 2000 + b"</svg>"
+    with open(path, "wb") as f:
+        f.write(body)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(body))
+    url = storage.url_for(name)
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert plain.headers["etag"] == f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    assert "content-encoding" not in plain.headers and "Accept-Encoding" in plain.headers["vary"]
+
+    zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["content-type"].startswith("image/svg+xml")
+    assert zipped.content == body  # decoded by the client
+    assert zipped.headers["etag"] != plain.headers["etag"]
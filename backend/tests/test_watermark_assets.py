@@ -0,0 +1,48 @@
+import os
+from PIL import Image
+from app.services.watermark_assets import WatermarkAssets
+
+
+def _write_logo(path, size=(400, 200), alpha=255):
+    Image.new("RGBA", size, (255, 0, 0, alpha)).save(path)
+
+
+def test_logo_variants_are_bucketed_and_reused(tmp_path):
+    logo_path = str(tmp_path / "watermark.png")
+    _write_logo(logo_path)
+    assets = WatermarkAssets(logo_path=logo_path, font_path=str(tmp_path / "none.ttf"), width_bucket=32)
+    a = assets.logo_for(300)
+    b = assets.logo_for(310)
+    assert a is b
+    assert a.width == 320
+    # 60% opacity applied once to the cached variant
+    assert a.getchannel("A").getextrema() == (153, 153)
+
+
+def test_lru_eviction(tmp_path):
+    logo_path = str(tmp_path / "watermark.png")
+    _write_logo(logo_path)
+    assets = WatermarkAssets(logo_path=logo_path, font_path="", width_bucket=10, max_variants=2)
+    first = assets.logo_for(100)
+    assets.logo_for(200)
+    assets.logo_for(300)
+    assert assets.logo_for(100) is not first
+
+
+def test_cache_invalidated_when_logo_changes(tmp_path):
+    logo_path = str(tmp_path / "watermark.png")
+    _write_logo(logo_path, alpha=255)
+    assets = WatermarkAssets(logo_path=logo_path, font_path="", recheck_secs=0)
+    before = assets.logo_for(256)
+    _write_logo(logo_path, size=(400, 100), alpha=100)
+    st = os.stat(logo_path)
+    os.utime(logo_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    after = assets.logo_for(256)
+    assert after is not before
+    assert after.getchannel("A").getextrema() == (60, 60)
+
+
+def test_missing_logo_and_font_fallback(tmp_path):
+    assets = WatermarkAssets(logo_path=str(tmp_path / "missing.png"), font_path=str(tmp_path / "missing.ttf"))
+    assert assets.logo_for(200) is None
+    assert assets.font(32) is assets.font(32)
@@ -68,7 +68,15 @@ export default function Competition() {
     form.append('price', batch.price === '' ? '0' : String(batch.price))
     batchFiles.forEach(f => form.append('images', f))
     try {
-      await api.post('/photos/upload/batch', form, { headers: { 'Content-Type': 'multipart/form-data' }})
+      const res = await api.post('/photos/upload/batch', form, { headers: { 'Content-Type': 'multipart/form-data' }})
+      const failed = res?.data?.failed || 0
+      if (failed) {
+        const firstError = (res.data.items || []).find(it => it.error)?.error || ''
+        const msg = `${res.data.uploaded} uploaded, ${failed} failed${firstError ? `: ${firstError}` : ''}`
+        setBatchMsg(msg)
+        toast.push({ type: res.data.uploaded ? 'success' : 'error', message: msg })
+        return
+      }
       setBatchMsg('Batch uploaded successfully')
       setBatch({ title: '', category: 'uncategorized', tags: '', price: '' })
       setBatchFiles([])